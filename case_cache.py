@@ -0,0 +1,52 @@
+import os
+import json
+import hashlib
+
+def case_key(params: dict) -> str:
+    """Short stable hash of the parameters that produced a case file."""
+    return hashlib.blake2b(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+def is_current(outpath: str, params: dict) -> bool:
+    """True if `outpath` exists and its sibling .key file matches `params`."""
+    if not os.path.exists(outpath):
+        return False
+    try:
+        with open(outpath + ".key", "r") as f:
+            return f.read() == case_key(params)
+    except FileNotFoundError:
+        return False
+
+def mark_current(outpath: str, params: dict):
+    """Record which parameters produced `outpath` (call only after it was written)."""
+    with open(outpath + ".key", "w") as f:
+        f.write(case_key(params))
+
+def is_newer(outpath: str, srcpath: str) -> bool:
+    """True if `outpath` exists and was written after `srcpath` (a solved case whose input has not changed)."""
+    try:
+        return os.path.getmtime(outpath) > os.path.getmtime(srcpath)
+    except OSError:
+        return False
+
+def result_status(outpath: str) -> str:
+    """The "status" field of a solver output JSON ("UNKNOWN" if unreadable)."""
+    try:
+        with open(outpath, "r") as f:
+            return json.load(f).get("status", "UNKNOWN")
+    except (OSError, ValueError):
+        return "UNKNOWN"
+
+def load_manifest(path: str) -> dict:
+    """Completed-case manifest {case: {"runtime": ..., "status": ...}}; empty if missing or unreadable."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(path: str, manifest: dict):
+    """Write to a temp file and rename it over `path`, so an interrupted sweep never leaves it half-written."""
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
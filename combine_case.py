@@ -1,8 +1,20 @@
 import os
+import math
 import time
 import json
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple
 from itertools import product
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from julia_pool import JuliaPool, PROJECT_PATH, run_julia
+from case_cache import is_current, mark_current
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib parser
+    orjson = None
+
+MAKE_BASE_CASE = f"{PROJECT_PATH}/make_base_case.jl"
 
 # lambda = 40.1 for 500 passengers
 # lambda = 59.4 for 750 passengers
@@ -27,17 +39,42 @@ params = {
 #     "seed": [42]
 # }
 
-def get_base_case(seed: int, lmbda: int):
-    try:
-        filename = f"base_case/base_{seed}_{lmbda}.json"
-        if not os.path.exists(filename):
-            os.system(f"~/tool/julia/julia /home/hpcnc/bus_opt/make_base_case.jl --seed={seed} --lambda_per_hour={lmbda} --outpath={filename}")
+def _base_case_path(seed: int, lmbda: float) -> str:
+    return f"base_case/base_{seed}_{lmbda}.json"
 
-    except Exception as e:
-        raise e
+def _base_case_args(seed: int, lmbda: float) -> List[str]:
+    return [f"--seed={seed}", f"--lambda_per_hour={lmbda}", f"--outpath={_base_case_path(seed, lmbda)}"]
 
+@lru_cache(maxsize=None)
+def get_base_case(seed: int, lmbda: float):
+    filename = _base_case_path(seed, lmbda)
+    if not os.path.exists(filename):
+        run_julia(MAKE_BASE_CASE, _base_case_args(seed, lmbda))
     return filename
 
+# Parsed base cases keyed by (seed, lambda); only read from, never mutated
+_BASE_JSON: Dict[Tuple[int, float], dict] = {}
+
+def _load_base(seed: int, lmbda: float) -> dict:
+    key = (seed, lmbda)
+    data = _BASE_JSON.get(key)
+    if data is None:
+        with open(get_base_case(seed=seed, lmbda=lmbda), "rb") as f:
+            data = orjson.loads(f.read()) if orjson else json.load(f)
+        _BASE_JSON[key] = data
+    return data
+
+def _init_worker(base_keys: List[Tuple[int, float]]):
+    # No-op for forked workers (cache inherited); spawned workers parse each base case once here
+    for seed, lmbda in base_keys:
+        _load_base(seed=seed, lmbda=lmbda)
+
+def _out_file(params: dict) -> str:
+    mapp = {40.1: "500", 59.4:"750", 82: "1000", 121.5:"1500", 165.5: "2000"}
+    cei = params["lambda_per_hour_cei"]
+    t2 = params["lambda_per_hour_t2"]
+    return f"final_case/tc_{mapp.get(cei, cei)}_{mapp.get(t2, t2)}_{params['w_max']}_{params['buses']}.json"
+
 def gen_case(params: dict):
     cei = params["lambda_per_hour_cei"]
     t2 = params["lambda_per_hour_t2"]
@@ -45,44 +82,63 @@ def gen_case(params: dict):
     bus = params["buses"]
     seed = params["seed"]
 
-    mapp = {40.1: "500", 59.4:"750", 82: "1000", 121.5:"1500", 165.5: "2000"}
-
-    base_case_cei = get_base_case(seed=seed, lmbda=cei)
-    base_case_t2 = get_base_case(seed=seed, lmbda=t2)
-
-    with open(base_case_cei, "r") as base_case_cei, open(base_case_t2, "r") as base_case_t2:
-        case_cei = json.load(base_case_cei)
-        case_t2 = json.load(base_case_t2)
-
-        arrivals_cei = {"CEI": case_cei["arrivals"]["TERMINAL"]}
-        arrivals_t2 = {"T2": case_t2["arrivals"]["TERMINAL"]}
-
-        combined_arrivals = {**arrivals_cei, **arrivals_t2}
-        
-        combined_data = {
-            "T": case_cei.get("T", case_t2.get("T")),
-            "L": case_cei["L"],
-            "tau": 40,
-            "c_max": 20,
-            "w_max": w_max,
-            "B": [i+1 for i in range(bus)],
-            "arrivals": combined_arrivals
-        }
-    out_file = f"final_case/tc_{mapp.get(cei, cei)}_{mapp.get(t2, t2)}_{w_max}_{bus}.json"
+    out_file = _out_file(params)
+    if is_current(out_file, params):
+        print(f"Skip {out_file} (up to date)")
+        return
+
+    case_cei = _load_base(seed=seed, lmbda=cei)
+    case_t2 = _load_base(seed=seed, lmbda=t2)
+
+    arrivals_cei = {"CEI": case_cei["arrivals"]["TERMINAL"]}
+    arrivals_t2 = {"T2": case_t2["arrivals"]["TERMINAL"]}
+
+    combined_arrivals = {**arrivals_cei, **arrivals_t2}
+
+    combined_data = {
+        "T": case_cei.get("T", case_t2.get("T")),
+        "L": case_cei["L"],
+        "tau": 40,
+        "c_max": 20,
+        "w_max": w_max,
+        "B": [i+1 for i in range(bus)],
+        "arrivals": combined_arrivals
+    }
+    # Written with json on both paths (orjson only speeds up the reads) so the file format does not depend on
+    # which packages are installed
     with open(out_file, "w") as f_out:
         json.dump(combined_data, f_out, indent=4)
+    mark_current(out_file, params)
 
     print(f"Combined file saved to {out_file}")
 
-def generate_permutation(params: dict) -> List[Dict[str, int]]:
+def generate_permutation(params: dict) -> Iterator[Dict[str, int]]:
     keys = list(params.keys())
     all_combos = product(*(params[k] for k in keys))
-    return [dict(zip(keys, combo)) for combo in all_combos]
+    return (dict(zip(keys, combo)) for combo in all_combos)
+
+def count_permutation(params: dict) -> int:
+    return math.prod(len(v) for v in params.values())
 
 def main():
-    possible_case = generate_permutation(params=params)
-    for index, case in enumerate(possible_case):
-        gen_case(case)
+    # Build and parse every distinct base case up front; pool workers start with
+    # both caches filled and never touch Julia or re-parse a base case
+    base_keys = sorted({(seed, lmbda) for seed in params["seed"] for lmbda in (*params["lambda_per_hour_cei"], *params["lambda_per_hour_t2"])})
+    missing = [key for key in base_keys if not os.path.exists(_base_case_path(*key))]
+    if missing:
+        with JuliaPool(size=min(len(missing), JuliaPool.default_size())) as julia:
+            julia.map(lambda key: julia.execute(MAKE_BASE_CASE, _base_case_args(*key)), missing)
+    for seed, lmbda in base_keys:
+        _load_base(seed=seed, lmbda=lmbda)
+
+    # Stale cases (real work) first, up-to-date ones (instant skips) last
+    possible_case = sorted(generate_permutation(params=params), key=lambda c: is_current(_out_file(c), c))
+
+    max_workers = max(1, min(len(possible_case), os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(base_keys,)) as ex:
+        futs = {ex.submit(gen_case, c): c for c in possible_case}
+        for f in as_completed(futs):
+            f.result()
 
     
 if __name__ == "__main__":
@@ -1,7 +1,12 @@
-import os
+import math
 import time
-from typing import List, Dict
+from typing import Dict, Iterator
 from itertools import product
+from functools import partial
+from julia_pool import JuliaPool, PROJECT_PATH
+from case_cache import is_current, mark_current
+
+MAKE_POISSON = f"{PROJECT_PATH}/make_poisson.jl"
 
 # lambda = 41.67 for 500 passenger
 # lambda = 83.33 for 500 passenger
@@ -12,21 +17,38 @@ params = {
     "w_max" : [80]
 }
 
-def generate_permutation(params: dict) -> List[Dict[str, int]]:
+def generate_permutation(params: dict) -> Iterator[Dict[str, int]]:
     keys = list(params.keys())
     all_combos = product(*(params[k] for k in keys))
-    return [dict(zip(keys, combo)) for combo in all_combos]
+    return (dict(zip(keys, combo)) for combo in all_combos)
+
+def count_permutation(params: dict) -> int:
+    return math.prod(len(v) for v in params.values())
 
-def execute_case(params: dict):
+def execute_case(params: dict, julia: JuliaPool):
     cei = params["lambda_per_hour_cei"]
     t2 = params["lambda_per_hour_t2"]
     w_max = params["w_max"]
     bus = params["buses"]
 
     outpath = f"case/tc_{cei}_{t2}_{w_max}_{bus}.json"
-    os.system(f"~/tool/julia/julia /home/hpcnc/bus_opt/make_poisson.jl --lambda_per_hour_cei={cei} --lambda_per_hour_t2={t2} --buses={bus} --w_max={w_max} --outpath={outpath}")
-    
-possible_case = generate_permutation(params=params)
-for index, case in enumerate(possible_case):
-    execute_case(case)
-    
+    if is_current(outpath, params):
+        print(f"Skip {outpath} (up to date)")
+        return
+
+    print(julia.execute(MAKE_POISSON, [
+        f"--lambda_per_hour_cei={cei}",
+        f"--lambda_per_hour_t2={t2}",
+        f"--buses={bus}",
+        f"--w_max={w_max}",
+        f"--outpath={outpath}"
+    ]))
+    mark_current(outpath, params)
+
+def main():
+    possible_case = generate_permutation(params=params)
+    with JuliaPool(size=min(count_permutation(params), JuliaPool.default_size())) as julia:
+        julia.map(partial(execute_case, julia=julia), possible_case)
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,12 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import numpy as np
 import json
-import moviepy.editor as mp
+import argparse
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib parser
+    orjson = None
+from matplotlib.animation import FFMpegWriter
 from matplotlib.patches import Rectangle, Circle
 
 
@@ -64,52 +69,51 @@ def create_bus_terminal_animation(data):
             'y': terminal_positions[initial_terminal][1] + 2.5, #- 1.0 + y_offset,
             'current_terminal': initial_terminal,
             'target_terminal': None,
-            'passengers': [],  # List of passenger IDs
+            'passengers': [],  # List of passenger slots
             'status': 'at_terminal',
             'travel_progress': 0,
             'departure_time': None,
             'arrival_time': None
         }
     
-    # Initialize passenger states
-    passenger_states = {}
-    
-    # Process all passengers from CEI
-    for p_id, arr_time in arrivals_cei.items():
-        passenger_states[p_id] = {
-            'origin': 'CEI',
-            'destination': 'T2',
-            'arrival_time': arr_time,
-            'status': 'waiting',  # waiting, on_bus, completed
-            'assigned_bus': None,
-            'pickup_time': None,
-            'wait_time': 0
-        }
-    
-    # Process all passengers from T2
-    for p_id, arr_time in arrivals_t2.items():
-        passenger_states[p_id+len(arrivals_cei)] = {
-            'origin': 'T2',
-            'destination': 'CEI',
-            'arrival_time': arr_time,
-            'status': 'waiting',
-            'assigned_bus': None,
-            'pickup_time': None,
-            'wait_time': 0
-        }
-    
+    # Passenger state as structure-of-arrays: one slot per passenger, CEI first then T2
+    ORIGIN_CEI, ORIGIN_T2 = 0, 1
+    WAITING, ON_BUS, COMPLETED = 0, 1, 2
+    terminal_code = {'CEI': ORIGIN_CEI, 'T2': ORIGIN_T2}
+
+    n_cei, n_t2 = len(arrivals_cei), len(arrivals_t2)
+    n_pass = n_cei + n_t2
+    p_label = np.fromiter((*arrivals_cei.keys(), *arrivals_t2.keys()), dtype=np.int64, count=n_pass)  # id shown on screen
+    arr_time = np.fromiter((*arrivals_cei.values(), *arrivals_t2.values()), dtype=np.int64, count=n_pass)
+    origin = np.repeat(np.array([ORIGIN_CEI, ORIGIN_T2], dtype=np.uint8), [n_cei, n_t2])
+    status = np.full(n_pass, WAITING, dtype=np.uint8)
+    assigned_bus = np.full(n_pass, -1, dtype=np.int16)
+    pickup_time = np.full(n_pass, -1, dtype=np.int32)
+
     # Process assignments to determine which bus picks up which passenger
+    slot_of = {('CEI', p_id): k for k, p_id in enumerate(arrivals_cei)}
+    slot_of.update({('T2', p_id): n_cei + k for k, p_id in enumerate(arrivals_t2)})
     for assignment in assignments:
-        p_id = assignment["p"]
-        bus_id = assignment["bus"]
-        pickup_time = assignment["t"]
-        terminal = assignment["terminal"]
-        if terminal == 'T2':
-            p_id += len(arrivals_cei)  # Adjust ID for T2 passengers
-        if p_id in passenger_states:
-            passenger_states[p_id]['assigned_bus'] = bus_id
-            passenger_states[p_id]['pickup_time'] = pickup_time
-        
+        k = slot_of.get((assignment["terminal"], assignment["p"]))
+        if k is not None:
+            assigned_bus[k] = assignment["bus"]
+            pickup_time[k] = assignment["t"]
+
+    # (bus, pickup_time, origin) -> slots boarding that departure
+    pickups = {}
+    for k in np.flatnonzero(assigned_bus >= 0):
+        pickups.setdefault((int(assigned_bus[k]), int(pickup_time[k]), int(origin[k])), []).append(k)
+    pickups = {key: np.array(slots) for key, slots in pickups.items()}
+
+    # Per terminal: slots sorted by arrival time, so "arrived by t" is a bisect, not a scan
+    arrival_order = {}
+    arrival_sorted = {}
+    for terminal, code in terminal_code.items():
+        slots = np.flatnonzero(origin == code)
+        slots = slots[np.argsort(arr_time[slots], kind='stable')]
+        arrival_order[terminal] = slots
+        arrival_sorted[terminal] = arr_time[slots]
+
     # Process departures
     departure_schedule = {}
     for departure in departures:
@@ -121,121 +125,129 @@ def create_bus_terminal_animation(data):
             departure_schedule[time] = []
         departure_schedule[time].append({'bus': bus_id, 'terminal': terminal})
     
-    # Colors for buses
-    bus_colors = plt.cm.Set3(np.linspace(0, 1, len(buses)))
+    # Colors for buses, resolved once to plain RGBA tuples (set on each bus artist at creation only)
+    color_by_bus = {bus_id: tuple(rgba) for bus_id, rgba in zip(buses, plt.cm.Set3(np.linspace(0, 1, len(buses))))}
     
     def get_waiting_passengers(terminal, current_time):
-        """Get passengers currently waiting at a terminal"""
-        waiting = []
-        for p_id, state in passenger_states.items():
-            if (state['origin'] == terminal and 
-                state['arrival_time'] <= current_time and 
-                state['status'] == 'waiting'):
-                waiting.append(p_id)
-        return waiting
+        """Get slots of passengers currently waiting at a terminal"""
+        n_arrived = np.searchsorted(arrival_sorted[terminal], current_time, side='right')
+        arrived = arrival_order[terminal][:n_arrived]
+        return np.sort(arrived[status[arrived] == WAITING])
 
     def get_passengers_on_bus(bus_id):
-        """Get passengers currently on a bus"""
-        on_bus = []
-        for p_id, state in passenger_states.items():
-            if state['assigned_bus'] == bus_id and state['status'] == 'on_bus':
-                on_bus.append(p_id)
-        return on_bus
-
-    def draw_terminal(pos, name, waiting_passengers, current_time):
-        """Draw terminal building and passenger queue"""
+        """Get slots of passengers currently on a bus"""
+        return np.flatnonzero((status == ON_BUS) & (assigned_bus == bus_id))
+
+    passengers_per_row = 3
+    max_passengers_display = 27  # Max passengers to display
+
+    def setup_terminal(pos, name):
+        """Create the terminal building and a fixed pool of passenger artists (hidden until used)"""
         x, y = pos
-        
-        # Terminal building
-        terminal = Rectangle((x-0.8, y-4), 1.6, 8, 
-                            facecolor='lightsteelblue', edgecolor='navy', linewidth=3)
-        ax.add_patch(terminal)
-        
-        # Terminal name
+
+        # Terminal building and name never change
+        ax.add_patch(Rectangle((x-0.8, y-4), 1.6, 8,
+                               facecolor='lightsteelblue', edgecolor='navy', linewidth=3))
         ax.text(x, y+4.25, name, ha='center', va='center', fontsize=16, fontweight='bold')
-        
+
+        # Passenger count
+        count_text = ax.text(x, y-3.5, '', ha='center', va='center', fontsize=12, fontweight='bold',
+                             bbox=dict(boxstyle="round,pad=0.3", facecolor='lightyellow'))
+
+        # Passenger icons with IDs: T2 queue grows to the right, CEI queue to the left
+        side = 1 if x > 6 else -1
+        id_fontsize = 12 if side > 0 else 9
+        slots = []
+        for i in range(max_passengers_display):
+            row = i // passengers_per_row
+            col = i % passengers_per_row
+            px = x + side * (2 + col * 0.7)
+            py = y + 3 - row * 0.6
+
+            circle = Circle((px, py), 0.12, facecolor='orange', edgecolor='darkorange', linewidth=2)
+            ax.add_patch(circle)
+            id_text = ax.text(px, py, '', ha='center', va='center',
+                              fontsize=id_fontsize, fontweight='bold', color='white')
+            wait_text = ax.text(px, py-0.25, '', ha='center', va='center', fontsize=8,
+                                bbox=dict(boxstyle="round,pad=0.1", facecolor='white', alpha=0.8))
+            slots.append((circle, id_text, wait_text))
+
+        more_text = ax.text(x+3 if side > 0 else x-2, y-2.5, '', ha='center', va='center', fontsize=10)
+
+        for circle, id_text, wait_text in slots:
+            circle.set_visible(False)
+            id_text.set_visible(False)
+            wait_text.set_visible(False)
+        more_text.set_visible(False)
+
+        # Passengers and time drawn by the previous frame
+        return {'count': count_text, 'slots': slots, 'more': more_text, 'shown': (), 'time': None}
+
+    def draw_terminal(name, waiting_passengers, current_time):
+        """Update the passenger queue artists of a terminal; returns the artists touched"""
+        artists = terminal_artists[name]
+        changed = [artists['count'], artists['more']]
+
         # Passenger count
         passenger_count = len(waiting_passengers)
-        ax.text(x, y-3.5, f'Waiting: {passenger_count}', 
-                ha='center', va='center', fontsize=12, fontweight='bold',
-                bbox=dict(boxstyle="round,pad=0.3", facecolor='lightyellow'))
-        
-        # Draw passenger icons with IDs
-        passengers_per_row = 3
-        max_passengers_display = 27  # Max passengers to display
-        if x > 6: # T2 side
-            for i, p_id in enumerate(waiting_passengers[:max_passengers_display]):  # Show max 24 passengers
-                row = i // passengers_per_row
-                col = i % passengers_per_row
-                px = x + 2 + col * 0.7
-                py = y + 3 - row * 0.6
-                
-                # Passenger circle
-                passenger_circle = Circle((px, py), 0.12, 
-                                        facecolor='orange', edgecolor='darkorange', linewidth=2)
-                ax.add_patch(passenger_circle)
-                
-                # Passenger ID
-                ax.text(px, py, str(p_id-len(arrivals_cei)), ha='center', va='center', 
-                    fontsize=12, fontweight='bold', color='white')
-                
-                # Show wait time
-                wait_time = current_time - passenger_states[p_id]['arrival_time']
-                ax.text(px, py-0.25, f'{wait_time}min', ha='center', va='center', 
-                    fontsize=8, bbox=dict(boxstyle="round,pad=0.1", facecolor='white', alpha=0.8))
-            
-            if passenger_count > 24:
-                ax.text(x+3, y-2.5, f'+{passenger_count-24} more passengers', 
-                    ha='center', va='center', fontsize=10)
-        else:  # CEI side
-            for i, p_id in enumerate(waiting_passengers[:max_passengers_display]):  # Show max 24 passengers
-                row = i // passengers_per_row
-                col = i % passengers_per_row
-                px = x - 2 - col * 0.7
-                py = y + 3 - row * 0.6
-                
-                # Passenger circle
-                passenger_circle = Circle((px, py), 0.12, 
-                                        facecolor='orange', edgecolor='darkorange', linewidth=2)
-                ax.add_patch(passenger_circle)
-                
-                # Passenger ID
-                ax.text(px, py, str(p_id), ha='center', va='center', 
-                    fontsize=9, fontweight='bold', color='white')
-                
-                # Show wait time
-                wait_time = current_time - passenger_states[p_id]['arrival_time']
-                ax.text(px, py-0.25, f'{wait_time}min', ha='center', va='center', 
-                    fontsize=8, bbox=dict(boxstyle="round,pad=0.1", facecolor='white', alpha=0.8))
-            
-            if passenger_count > 24:
-                ax.text(x-2, y-2.5, f'+{passenger_count-24} more passengers', 
-                    ha='center', va='center', fontsize=10)
-                
-    def draw_bus(bus_id, state, color, current_time):
-        """Draw a bus with its current state and passengers"""
-        x, y = state['x'], state['y']
-        
-        # Bus body (larger to show more detail)
-        bus_rect = Rectangle((x-0.5, y-(0.75*(bus_id-1))), 1.0, 0.5, 
-                            facecolor=color, edgecolor='black', linewidth=2)
-        ax.add_patch(bus_rect)
-        
-        # Bus ID
-        ax.text(x, y-(0.75*(bus_id-1))+0.25, f'Bus {bus_id}', ha='center', va='center', 
-                fontsize=10, fontweight='bold')
-        
-        # Get passengers on this bus
-        passengers_on_bus = get_passengers_on_bus(bus_id)
-        
+        artists['count'].set_text(f'Waiting: {passenger_count}')
+
+        shown = tuple(waiting_passengers[:max_passengers_display].tolist())
+        same_set = shown == artists['shown']
+        if same_set and current_time == artists['time']:
+            # Nothing moved: the slots already show this frame, only hand them back for blitting
+            for circle, id_text, wait_text in artists['slots'][:len(shown)]:
+                changed.extend((circle, id_text, wait_text))
+        elif same_set:
+            # Same queue, only the wait times advanced
+            for k, (circle, id_text, wait_text) in zip(shown, artists['slots']):
+                wait_text.set_text(f'{current_time - arr_time[k]}min')
+                changed.extend((circle, id_text, wait_text))
+        else:
+            for i, (circle, id_text, wait_text) in enumerate(artists['slots']):
+                visible = i < len(shown)
+                if visible:
+                    k = shown[i]
+                    id_text.set_text(str(p_label[k]))
+                    wait_time = current_time - arr_time[k]
+                    wait_text.set_text(f'{wait_time}min')
+                if visible or circle.get_visible():
+                    circle.set_visible(visible)
+                    id_text.set_visible(visible)
+                    wait_text.set_visible(visible)
+                    changed.extend((circle, id_text, wait_text))
+        artists['shown'] = shown
+        artists['time'] = current_time
+
+        artists['more'].set_visible(passenger_count > 24)
+        if passenger_count > 24:
+            artists['more'].set_text(f'+{passenger_count-24} more passengers')
+        return changed
+
+    def setup_bus(bus_id):
+        """Create the artists of one bus"""
+        body = Rectangle((0, 0), 1.0, 0.5, facecolor=color_by_bus[bus_id], edgecolor='black', linewidth=2)
+        ax.add_patch(body)
+        label = ax.text(0, 0, f'Bus {bus_id}', ha='center', va='center', fontsize=10, fontweight='bold')
+        load = ax.text(0, 0, '', ha='center', va='center', fontsize=9, fontweight='bold',
+                       bbox=dict(boxstyle="round,pad=0.2", facecolor='white', alpha=0.9))
+        return {'body': body, 'label': label, 'load': load}
+
+    def draw_bus(bus_id, state, current_time):
+        """Move a bus to its current position and refresh its passenger count"""
+        artists = bus_artists[bus_id]
+        x, y = state['x'], state['y'] - 0.75*(bus_id-1)
+
+        artists['body'].set_xy((x-0.5, y))
+        artists['label'].set_position((x, y+0.25))
         # Passenger count and capacity
-        ax.text(x, y-(0.75*(bus_id-1))+0.5, f'Passengers: {len(passengers_on_bus)}/{capacity}', 
-                ha='center', va='center', fontsize=9, fontweight='bold',
-                bbox=dict(boxstyle="round,pad=0.2", facecolor='white', alpha=0.9))
+        artists['load'].set_position((x, y+0.5))
+        artists['load'].set_text(f'Passengers: {len(get_passengers_on_bus(bus_id))}/{capacity}')
+        return [artists['body'], artists['label'], artists['load']]
 
     def update_simulation(current_time):
         """Update simulation state based on current time"""
-        
+
         if current_time in departure_schedule:
             for departure in departure_schedule[current_time]:
                 bus_id = departure['bus']
@@ -243,13 +255,11 @@ def create_bus_terminal_animation(data):
                 
                 if bus_states[bus_id]['status'] == 'at_terminal':
                     # Pick up assigned passengers
-                    for full_id, p_state in passenger_states.items():
-                        if (p_state['assigned_bus'] == bus_id and 
-                            p_state['pickup_time'] == current_time and
-                            p_state['status'] == 'waiting' and
-                            p_state['origin'] == terminal):
-                            p_state['status'] = 'on_bus'
-                            bus_states[bus_id]['passengers'].append(full_id)
+                    boarding = pickups.get((bus_id, current_time, terminal_code[terminal]))
+                    if boarding is not None:
+                        boarding = boarding[status[boarding] == WAITING]
+                        status[boarding] = ON_BUS
+                        bus_states[bus_id]['passengers'].extend(boarding.tolist())
 
                     
                     bus_states[bus_id]['status'] = 'traveling'
@@ -271,8 +281,7 @@ def create_bus_terminal_animation(data):
                     state['x'] = terminal_positions[state['current_terminal']][0]
                     
                     # Passengers disembark and complete their journey
-                    for p_id in state['passengers']:
-                        passenger_states[p_id]['status'] = 'completed'
+                    status[state['passengers']] = COMPLETED
                     state['passengers'] = []
                     state['target_terminal'] = None
                     
@@ -284,80 +293,90 @@ def create_bus_terminal_animation(data):
 
     
     
+    # Create every artist once; animate() only updates them
+    terminal_artists = {name: setup_terminal(terminal_positions[name], name) for name in ('CEI', 'T2')}
+    bus_artists = {bus_id: setup_bus(bus_id) for bus_id in buses}
+
+    time_text = ax.text(6, 6.5, '', ha='center', va='center', fontsize=14, fontweight='bold',
+                        bbox=dict(boxstyle="round,pad=0.4", facecolor='lightgray'))
+    stats_text = ax.text(6, 6.0, '', ha='center', va='center', fontsize=12,
+                         bbox=dict(boxstyle="round,pad=0.3", facecolor='lightyellow'))
+    # Objective value
+    ax.text(6, 5.5, f'Objective Value: {data["objective"]} | Status: {data["status"]}',
+            ha='center', va='center', fontsize=11,
+            bbox=dict(boxstyle="round,pad=0.3", facecolor='lightgreen'))
+    # Progress bar
+    progress_bar = Rectangle((-1, 7), 0, 0.3, facecolor='green', alpha=0.7)
+    ax.add_patch(progress_bar)
+    progress_text = ax.text(6, 7.5, '', ha='center', va='center', fontsize=10)
+
     def animate(frame):
-        ax.clear()
-        ax.set_xlim(-2, 14)
-        ax.set_ylim(-4, 8)
-        ax.set_aspect('equal')
-        ax.axis('off')
-        ax.set_title('Bus Terminal Optimization Results Animation', fontsize=16, fontweight='bold', pad=20)
-        
         current_time = frame//2  # 2 frames per time unit
-        
+
         # Draw terminals with waiting passengers
         cei_waiting = get_waiting_passengers('CEI', current_time)
-        # print("cei_waiting",cei_waiting)
         t2_waiting = get_waiting_passengers('T2', current_time)
-        # print("t2_waiting",t2_waiting)
-        
-        draw_terminal(terminal_positions['CEI'], 'CEI', cei_waiting, current_time)
-        draw_terminal(terminal_positions['T2'], 'T2', t2_waiting, current_time)
+
+        changed = draw_terminal('CEI', cei_waiting, current_time)
+        changed += draw_terminal('T2', t2_waiting, current_time)
 
         # Update simulation
         update_simulation(current_time)
-        
+
         # Draw buses
-        for i, bus_id in enumerate(buses):
-            draw_bus(bus_id, bus_states[bus_id], bus_colors[i], current_time)
-        
+        for bus_id in buses:
+            changed += draw_bus(bus_id, bus_states[bus_id], current_time)
+
         # Statistics
         total_waiting = len(cei_waiting) + len(t2_waiting)
-        total_on_buses = sum(len(get_passengers_on_bus(bus_id)) for bus_id in buses)
-        total_completed = sum(1 for p in passenger_states.values() if p['status'] == 'completed')
-        
-        ax.text(6, 6.5, f'Time: {current_time} minutes', 
-               ha='center', va='center', fontsize=14, fontweight='bold',
-               bbox=dict(boxstyle="round,pad=0.4", facecolor='lightgray'))
-        
-        ax.text(6, 6.0, f'Waiting: {total_waiting} | On Buses: {total_on_buses} | Completed: {total_completed}', 
-               ha='center', va='center', fontsize=12,
-               bbox=dict(boxstyle="round,pad=0.3", facecolor='lightyellow'))
-        
-        # Objective value
-        ax.text(6, 5.5, f'Objective Value: {data["objective"]} | Status: {data["status"]}', 
-               ha='center', va='center', fontsize=11,
-               bbox=dict(boxstyle="round,pad=0.3", facecolor='lightgreen'))
-        
+        total_on_buses = int((status == ON_BUS).sum())
+        total_completed = int((status == COMPLETED).sum())
+
+        time_text.set_text(f'Time: {current_time} minutes')
+        stats_text.set_text(f'Waiting: {total_waiting} | On Buses: {total_on_buses} | Completed: {total_completed}')
+
         # Progress bar
         progress = min(current_time / T_end, 1.0) if T_end > 0 else 0
-        progress_bar = Rectangle((-1, 7), 14 * progress, 0.3, 
-                               facecolor='green', alpha=0.7)
-        ax.add_patch(progress_bar)
-        ax.text(6, 7.5, f'Progress: {progress*100:.1f}%', ha='center', va='center', fontsize=10)
-    
+        progress_bar.set_width(14 * progress)
+        progress_text.set_text(f'Progress: {progress*100:.1f}%')
+
+        return (*changed, time_text, stats_text, progress_bar, progress_text)
+
     # Create animation
-    anim = animation.FuncAnimation(fig, animate, frames=T_end*2, interval=100, repeat=True)
+    anim = animation.FuncAnimation(fig, animate, frames=T_end*2, interval=100, repeat=True, blit=True)
     
     plt.tight_layout()
     return fig, anim
 
 
-for filename in files:
-    try:
-        with open(f"{PROJECT_PATH}/{data_path}/{filename}", "r") as f:
-            data = json.load(f)
-    except Exception as e:
-        print(f"error reading {filename}: {e}")
-        continue
-
-    try:
-        print(f"creating animation for {filename}...")
-        fig, anim = create_bus_terminal_animation(data)
-        anim.save(PROJECT_PATH + f"/animation/{filename[:-5]}.gif", writer='pillow', fps=15)
-        print(f"saved animation...")
-        clip = mp.VideoFileClip(PROJECT_PATH + f"/animation/{filename[:-5]}.gif")
-        print("converting to MP4...")
-        clip.write_videofile(PROJECT_PATH + f"/animation/{filename[:-5]}.mp4")
-        print("===== finished ====")
-    except Exception as e:
-        print(f"error creating aimation for {filename} : {e}")
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--gif", action="store_true", help="Also write a GIF next to the MP4")
+    args = ap.parse_args()
+
+    for filename in files:
+        try:
+            with open(f"{PROJECT_PATH}/{data_path}/{filename}", "rb") as f:
+                data = orjson.loads(f.read()) if orjson else json.load(f)
+        except Exception as e:
+            print(f"error reading {filename}: {e}")
+            continue
+
+        try:
+            print(f"creating animation for {filename}...")
+            fig, anim = create_bus_terminal_animation(data)
+            anim.save(PROJECT_PATH + f"/animation/{filename[:-5]}.mp4", writer=FFMpegWriter(fps=15))
+            print(f"saved animation...")
+            plt.close(fig)
+            if args.gif:
+                # animate() mutates the simulation state, so the GIF needs a fresh animation from t=0
+                fig, anim = create_bus_terminal_animation(data)
+                anim.save(PROJECT_PATH + f"/animation/{filename[:-5]}.gif", writer='pillow', fps=15)
+                print(f"saved gif...")
+                plt.close(fig)
+            print("===== finished ====")
+        except Exception as e:
+            print(f"error creating aimation for {filename} : {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import os
+import queue
+import asyncio
+import subprocess
+from typing import Callable, Iterable, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_PATH = "/home/hpcnc/bus_opt"
+JULIA_BIN = os.path.expanduser("~/tool/julia/julia")
+WORKER_SCRIPT = os.path.join(PROJECT_PATH, "julia_worker.jl")
+
+END_MARKER = "<<<END_EXECUTION>>>"
+ERROR_MARKER = "<<<ERROR_EXECUTION>>>"
+
+class JuliaJobError(RuntimeError):
+    """A job failed; `output` holds the worker's stdout/stderr collected for it."""
+
+    def __init__(self, message: str, output: str = ""):
+        super().__init__(message)
+        self.output = output
+
+def _job_line(script: str, args: List[str]) -> str:
+    return "\t".join([script, *args]) + "\n"
+
+def _collect(line: str, output: List[str], script: str, args: List[str]) -> bool:
+    """Append one worker output line to `output`; True once the job has finished. Raises JuliaJobError on failure."""
+    line = line.rstrip("\n")
+    if line == END_MARKER:
+        return True
+    if line.startswith(ERROR_MARKER):
+        raise JuliaJobError(f"{script} {' '.join(args)} failed: {line[len(ERROR_MARKER):].strip()}", "\n".join(output))
+    output.append(line)
+    return False
+
+def run_julia(script: str, args: List[str]):
+    """Run one Julia script in a fresh process. Raises CalledProcessError on failure."""
+    subprocess.run([JULIA_BIN, script, *args], check=True)
+
+class JuliaWorker:
+    """One long-lived `julia julia_worker.jl` process fed one job per line on stdin."""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            [JULIA_BIN, WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # warnings and stack traces go to the job's log, not the parent terminal
+            text=True,
+            bufsize=1
+        )
+
+    def execute(self, script: str, args: List[str]) -> str:
+        """Run `script` with `args` and return its stdout+stderr. Raises JuliaJobError on failure."""
+        self.proc.stdin.write(_job_line(script, args))
+        self.proc.stdin.flush()
+
+        output = []
+        for line in self.proc.stdout:
+            if _collect(line, output, script, args):
+                return "\n".join(output)
+        raise JuliaJobError(f"Julia worker exited with code {self.proc.wait()}", "\n".join(output))
+
+    def close(self):
+        if self.proc.stdin:
+            self.proc.stdin.close()
+        self.proc.wait()
+
+class JuliaPool:
+    """Fixed set of JuliaWorker processes so Julia startup is paid once per worker, not per job."""
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = size or self.default_size()
+        self._workers = [JuliaWorker() for _ in range(self.size)]
+        self._idle = queue.Queue()
+        for w in self._workers:
+            self._idle.put(w)
+
+    @staticmethod
+    def default_size() -> int:
+        return max(1, (os.cpu_count() or 2) // 2)
+
+    def execute(self, script: str, args: List[str]) -> str:
+        """Run one job on the next idle worker (blocking)."""
+        worker = self._idle.get()
+        try:
+            return worker.execute(script, args)
+        finally:
+            self._idle.put(worker)
+
+    def map(self, fn: Callable, items: Iterable) -> list:
+        """Call fn(item) for every item, one thread per worker; results keep input order."""
+        with ThreadPoolExecutor(max_workers=self.size) as ex:
+            return list(ex.map(fn, items))
+
+    def close(self):
+        for w in self._workers:
+            w.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class AsyncJuliaPool:
+    """asyncio counterpart of JuliaPool: the workers are asyncio subprocesses and jobs wait on an
+    idle-worker queue, so a sweep needs no threads. Use as `async with AsyncJuliaPool(n) as julia:`."""
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = size or JuliaPool.default_size()
+        self._procs = []
+        self._idle = None
+
+    async def __aenter__(self):
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            proc = await asyncio.create_subprocess_exec(
+                JULIA_BIN, WORKER_SCRIPT,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+            self._procs.append(proc)
+            self._idle.put_nowait(proc)
+        return self
+
+    async def execute(self, script: str, args: List[str]) -> str:
+        """Run one job on the next idle worker and return its stdout+stderr. Raises JuliaJobError on failure."""
+        proc = await self._idle.get()
+        try:
+            proc.stdin.write(_job_line(script, args).encode())
+            await proc.stdin.drain()
+
+            output = []
+            while line := await proc.stdout.readline():
+                if _collect(line.decode(), output, script, args):
+                    return "\n".join(output)
+            raise JuliaJobError(f"Julia worker exited with code {await proc.wait()}", "\n".join(output))
+        finally:
+            self._idle.put_nowait(proc)
+
+    async def __aexit__(self, *exc):
+        for proc in self._procs:
+            proc.stdin.close()
+            await proc.wait()
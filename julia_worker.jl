@@ -0,0 +1,41 @@
+# ---------- Persistent Julia worker ----------
+# Reads one job per line from stdin:  <script.jl>\t--key=value\t--key=value ...
+# Runs the script with those ARGS and prints END_MARKER (or ERROR_MARKER + message)
+# so a single Julia process (and its loaded packages / compiled code) serves a whole sweep.
+#   julia julia_worker.jl
+
+const END_MARKER   = "<<<END_EXECUTION>>>"
+const ERROR_MARKER = "<<<ERROR_EXECUTION>>>"
+
+# script path -> module it was first included into
+const LOADED = Dict{String,Module}()
+
+function run_job(line::AbstractString)
+    parts  = split(line, '\t')
+    script = abspath(String(parts[1]))
+    empty!(ARGS)
+    append!(ARGS, String.(parts[2:end]))
+
+    mod = get(LOADED, script, nothing)
+    if mod !== nothing && isdefined(mod, :parse_and_run)
+        # Scripts with an entry point are compiled once and re-invoked
+        Base.invokelatest(getfield(mod, :parse_and_run))
+    else
+        # Plain top-level scripts are re-included into a fresh module
+        mod = Module(Symbol(basename(script)))
+        Base.include(mod, script)
+        LOADED[script] = mod
+    end
+end
+
+for line in eachline(stdin)
+    isempty(strip(line)) && continue
+    try
+        run_job(line)
+        println(END_MARKER)
+    catch err
+        println(ERROR_MARKER, " ", replace(sprint(showerror, err), '\n' => ' '))
+    end
+    flush(stderr)  # the parent reads stderr through the same pipe; keep it ahead of the marker
+    flush(stdout)
+end
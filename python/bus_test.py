@@ -1,5 +1,10 @@
 # bus_model_highs_milp.py  — MILP (รองรับ HiGHS)
+import os
+import json
+import hashlib
 import pyomo.environ as pyo
+from pyomo.contrib.appsi.base import TerminationCondition
+from pyomo.contrib.appsi.solvers.highs import Highs
 
 # ---------- Time grid ----------
 STEP_MIN = 1
@@ -16,22 +21,38 @@ P_r = list(range(1, 10))            # ผู้โดยสารฝั่ง CR
 tau_min    = 25
 tau_slots  = tau_min // STEP_MIN   # ดีเลย์เป็น "จำนวนช่อง"
 c_max      = 50
-M          = 10_000
 w_max_min  = 60
 w_max      = w_max_min // STEP_MIN # หน่วยเป็น "ช่องเวลา"
 
 # ตัวอย่าง arrival ให้อยู่บนกริด
 arr   = {i: T_list[(2*i) % N] for i in P}
 arr_r = {i: T_list[(3*i) % N] for i in P_r}
-arr_s   = {i: arr[i]  / STEP_MIN for i in P}    # แปลงเป็น "ช่องเวลา"
-arr_r_s = {i: arr_r[i]/ STEP_MIN for i in P_r}
+# แปลงเป็น "ช่องเวลา" ครั้งเดียว (จำนวนเต็ม: arrival อยู่บนกริดอยู่แล้ว)
+arr_s   = {i: arr[i]   // STEP_MIN for i in P}
+arr_r_s = {i: arr_r[i] // STEP_MIN for i in P_r}
+t_slot  = tuple(t // STEP_MIN for t in T_list)
+# ช่องเวลาท้ายฮอไรซอน τ ช่อง (F10/F13)
+last_idx = range(max(0, N - tau_slots), N) if tau_slots > 0 else range(0)
 
 # ---------- Model ----------
 m = pyo.ConcreteModel()
 
 # Vars
-m.x    = pyo.Var(P, B, T, domain=pyo.Binary)        # CEI assignment
-m.x_r  = pyo.Var(P_r, B, T, domain=pyo.Binary)      # CRBT2 assignment
+# |B| = 1: ดัชนีบัสของ x ซ้ำซ้อน -> ใช้ x[i,t] แทน x[i,c,t] (binary น้อยลง)
+SINGLE_BUS = len(B) == 1
+if SINGLE_BUS:
+    m.x    = pyo.Var(P, T, domain=pyo.Binary)           # CEI assignment
+    m.x_r  = pyo.Var(P_r, T, domain=pyo.Binary)         # CRBT2 assignment
+else:
+    m.x    = pyo.Var(P, B, T, domain=pyo.Binary)        # CEI assignment
+    m.x_r  = pyo.Var(P_r, B, T, domain=pyo.Binary)      # CRBT2 assignment
+
+def X(i, c, t):
+    return m.x[i,t] if SINGLE_BUS else m.x[i,c,t]
+
+def X_r(i, c, t):
+    return m.x_r[i,t] if SINGLE_BUS else m.x_r[i,c,t]
+
 m.ba   = pyo.Var(T, B, domain=pyo.Binary)           # bus avail @ CEI
 m.ba_r = pyo.Var(T, B, domain=pyo.Binary)           # bus avail @ CRBT2
 m.bd   = pyo.Var(T, B, domain=pyo.Binary)           # depart CEI
@@ -50,93 +71,140 @@ m.obj = pyo.Objective(
 
 # ---------- Constraints ----------
 
+# Indexed Constraint rules: Pyomo builds each block in one pass instead of per-row ConstraintList.add
+k_of = {t: k for k, t in enumerate(T_list)}
+
 # F1, F4: assign exactly once
-m.assign = pyo.ConstraintList()
-for i in P:
-    m.assign.add(sum(m.x[i,c,t] for c in B for t in T) == 1)
-for i in P_r:
-    m.assign.add(sum(m.x_r[i,c,t] for c in B for t in T) == 1)
+def _assign(m, i):
+    return sum(X(i,c,t) for c in B for t in T) == 1
+def _assign_r(m, i):
+    return sum(X_r(i,c,t) for c in B for t in T) == 1
+m.assign   = pyo.Constraint(P,   rule=_assign)
+m.assign_r = pyo.Constraint(P_r, rule=_assign_r)
 
 # F2,F3,F5,F6: capacity linked to departures
-m.cap = pyo.ConstraintList()
-for t in T:
-    for c in B:
-        m.cap.add(sum(m.x[i,c,t]   for i in P)   <= c_max * m.bd[t,c])
-        m.cap.add(sum(m.x_r[i,c,t] for i in P_r) <= c_max * m.bd_r[t,c])
+def _cap(m, t, c):
+    return sum(X(i,c,t)   for i in P)   <= c_max * m.bd[t,c]
+def _cap_r(m, t, c):
+    return sum(X_r(i,c,t) for i in P_r) <= c_max * m.bd_r[t,c]
+m.cap   = pyo.Constraint(T, B, rule=_cap)
+m.cap_r = pyo.Constraint(T, B, rule=_cap_r)
 
 # F7,F8: depart only if bus available
-for t in T:
-    for c in B:
-        m.cap.add(m.bd[t,c]   <= m.ba[t,c])
-        m.cap.add(m.bd_r[t,c] <= m.ba_r[t,c])
+m.avail   = pyo.Constraint(T, B, rule=lambda m, t, c: m.bd[t,c]   <= m.ba[t,c])
+m.avail_r = pyo.Constraint(T, B, rule=lambda m, t, c: m.bd_r[t,c] <= m.ba_r[t,c])
+
+# F11: initial location
+m.init_loc = pyo.Constraint(B, rule=lambda m, c: m.ba[T_list[0],c] + m.ba_r[T_list[0],c] == 1)
 
 # F9–F12: flow equalities across time (index ด้วย k เพื่ออ้าง t_prev / t - tau)
-m.flow = pyo.ConstraintList()
-for k, t in enumerate(T_list):
+def _flow(m, t, c):
+    # CEI
+    k = k_of[t]
     if k == 0:
-        # F11: initial location
-        for c in B:
-            m.flow.add(m.ba[t,c] + m.ba_r[t,c] == 1)
-        continue
+        return pyo.Constraint.Skip
     t_prev = T_list[k-1]
-    for c in B:
-        # CEI
-        if k - tau_slots >= 0:
-            t_arr_from_r = T_list[k - tau_slots]
-            m.flow.add(m.ba[t,c]   == m.ba[t_prev,c]   - m.bd[t_prev,c]   + m.bd_r[t_arr_from_r,c])
-        else:
-            m.flow.add(m.ba[t,c]   == m.ba[t_prev,c]   - m.bd[t_prev,c])
-        # CRBT2
-        if k - tau_slots >= 0:
-            t_arr_from_a = T_list[k - tau_slots]
-            m.flow.add(m.ba_r[t,c] == m.ba_r[t_prev,c] - m.bd_r[t_prev,c] + m.bd[t_arr_from_a,c])
-        else:
-            m.flow.add(m.ba_r[t,c] == m.ba_r[t_prev,c] - m.bd_r[t_prev,c])
+    inbound = m.bd_r[T_list[k - tau_slots],c] if k - tau_slots >= 0 else 0
+    return m.ba[t,c]   == m.ba[t_prev,c]   - m.bd[t_prev,c]   + inbound
+def _flow_r(m, t, c):
+    # CRBT2
+    k = k_of[t]
+    if k == 0:
+        return pyo.Constraint.Skip
+    t_prev = T_list[k-1]
+    inbound = m.bd[T_list[k - tau_slots],c] if k - tau_slots >= 0 else 0
+    return m.ba_r[t,c] == m.ba_r[t_prev,c] - m.bd_r[t_prev,c] + inbound
+m.flow   = pyo.Constraint(T, B, rule=_flow)
+m.flow_r = pyo.Constraint(T, B, rule=_flow_r)
 
 # M3: cannot be available at both stations simultaneously
-for t in T:
-    for c in B:
-        m.flow.add(m.ba[t,c] + m.ba_r[t,c] <= 1)
+m.single_loc = pyo.Constraint(T, B, rule=lambda m, t, c: m.ba[t,c] + m.ba_r[t,c] <= 1)
 
-# T1,T2: link Dep with chosen slot (Dep หน่วยเป็น "ช่อง")
-for i in P:
-    for c in B:
-        for t in T:
-            m.flow.add(m.Dep[i]   >= (t/STEP_MIN) - M*(1 - m.x[i,c,t]))
-for i in P_r:
-    for c in B:
-        for t in T:
-            m.flow.add(m.Dep_r[i] >= (t/STEP_MIN) - M*(1 - m.x_r[i,c,t]))
+# T1,T2: Dep = chosen slot (Dep หน่วยเป็น "ช่อง"); exact because each passenger is assigned once (F1/F4)
+def _dep_link(m, i):
+    return m.Dep[i]   == sum(t_slot[k] * X(i,c,T_list[k])   for c in B for k in range(N))
+def _dep_link_r(m, i):
+    return m.Dep_r[i] == sum(t_slot[k] * X_r(i,c,T_list[k]) for c in B for k in range(N))
+m.dep_link   = pyo.Constraint(P,   rule=_dep_link)
+m.dep_link_r = pyo.Constraint(P_r, rule=_dep_link_r)
 
 # s = waiting time = Dep - arr (bounded by w_max)
-for i in P:
-    m.flow.add(m.s[i]   >= m.Dep[i]   - arr_s[i])   # definition
-    m.flow.add(m.s[i]   <= w_max)                   # F14
-for i in P_r:
-    m.flow.add(m.s_r[i] >= m.Dep_r[i] - arr_r_s[i])
-    m.flow.add(m.s_r[i] <= w_max)                   # F15
+m.wait_def   = pyo.Constraint(P,   rule=lambda m, i: m.s[i]   >= m.Dep[i]   - arr_s[i])    # definition
+m.wait_cap   = pyo.Constraint(P,   rule=lambda m, i: m.s[i]   <= w_max)                    # F14
+m.wait_def_r = pyo.Constraint(P_r, rule=lambda m, i: m.s_r[i] >= m.Dep_r[i] - arr_r_s[i])
+m.wait_cap_r = pyo.Constraint(P_r, rule=lambda m, i: m.s_r[i] <= w_max)                    # F15
 
 # F10, F13: forbid boarding too late (ท้ายฮอไรซอนช่วง τ)
-last_idx = list(range(max(0, N - tau_slots), N)) if tau_slots > 0 else []
-for idx in last_idx:
-    t_forbid = T_list[idx]
-    for c in B:
-        for i in P:
-            m.flow.add(m.x[i,c,t_forbid] == 0)
-        for i in P_r:
-            m.flow.add(m.x_r[i,c,t_forbid] == 0)
+T_forbid = [T_list[idx] for idx in last_idx]
+m.late   = pyo.Constraint(T_forbid, B, P,   rule=lambda m, t, c, i: X(i,c,t)   == 0)
+m.late_r = pyo.Constraint(T_forbid, B, P_r, rule=lambda m, t, c, i: X_r(i,c,t) == 0)
+
+# ---------- Warm start (ใช้คำตอบของ instance เดิม / instance ที่บัสน้อยกว่า 1 คันเป็น MIP start) ----------
+WARMSTART_DIR = "warmstart"
+
+def instance_key(n_bus):
+    params = {"B": n_bus, "horizon": T_list[-1], "step": STEP_MIN, "tau": tau_min,
+              "c_max": c_max, "w_max": w_max_min, "arr": arr, "arr_r": arr_r}
+    return hashlib.blake2b(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+def warmstart_path(n_bus):
+    return os.path.join(WARMSTART_DIR, f"warmstart_{instance_key(n_bus)}.json")
+
+def load_warmstart(m):
+    """Seed variable values from a saved solution; returns the file used (or None)."""
+    for path in (warmstart_path(len(B)), warmstart_path(len(B) - 1)):
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                sol = json.load(f)
+            # x / x_r เก็บเป็น (i, c, t) ที่ถูกเลือก -> map ลง layout ปัจจุบัน (x[i,t] หรือ x[i,c,t])
+            for name, var, ids in (("x", X, P), ("x_r", X_r, P_r)):
+                if name in sol:
+                    chosen = {tuple(k) for k in sol.pop(name)}
+                    for i in ids:
+                        for c in B:
+                            for t in T:
+                                var(i,c,t).set_value(int((i,c,t) in chosen), skip_validation=True)
+            for v in m.component_data_objects(pyo.Var):
+                if v.name in sol:
+                    v.set_value(sol[v.name], skip_validation=True)
+            # บัสที่ไม่มีในคำตอบเดิม (จาก instance บัสน้อยกว่า) -> จอดที่ CEI ตลอด ไม่ออกเที่ยว
+            for c in B:
+                if m.ba[T_list[0],c].value is None:
+                    for t in T:
+                        for v, val in ((m.ba, 1), (m.ba_r, 0), (m.bd, 0), (m.bd_r, 0)):
+                            v[t,c].set_value(val, skip_validation=True)
+            return path
+    return None
+
+def save_warmstart(m):
+    os.makedirs(WARMSTART_DIR, exist_ok=True)
+    sol = {v.name: v.value for v in m.component_data_objects(pyo.Var)
+           if v.value is not None and v.parent_component() not in (m.x, m.x_r)}
+    # x / x_r ไม่ขึ้นกับ layout (SINGLE_BUS ใช้ x[i,t]) -> instance ที่บัสเพิ่ม 1 คันโหลดต่อได้
+    sol["x"]   = [[i, c, t] for i in P   for c in B for t in T if (X(i,c,t).value or 0) > 0.5]
+    sol["x_r"] = [[i, c, t] for i in P_r for c in B for t in T if (X_r(i,c,t).value or 0) > 0.5]
+    with open(warmstart_path(len(B)), "w") as f:
+        json.dump(sol, f)
 
 # ---------- Solve with HiGHS ----------
-solver = pyo.SolverFactory("highs")
-# ตัวเลือกเสริม:
-solver.options["threads"] = 20
-res = solver.solve(m, tee=True)
-
-print("Status:", res.solver.status, res.solver.termination_condition)
+ws_path = load_warmstart(m)
+if ws_path:
+    print("Warm start from", ws_path)
+# APPSI persistent interface: ส่งโมเดลเข้า HiGHS ในหน่วยความจำโดยตรง ไม่ต้องเขียนไฟล์ .lp/.nl
+# (เก็บ opt ไว้ใช้ซ้ำได้ — solve(m) ครั้งถัดไปส่งเฉพาะส่วนที่เปลี่ยน)
+opt = Highs()
+opt.highs_options = {"threads": 20}
+opt.config.stream_solver = True
+opt.config.warmstart = ws_path is not None
+res = opt.solve(m)
+if res.termination_condition == TerminationCondition.optimal:
+    save_warmstart(m)
+
+print("Status:", res.termination_condition)
 print("Objective (total wait slots):", pyo.value(m.obj))
 for i in P:
     # หา t ที่เลือก
-    chosen = [(c,t) for c in B for t in T if pyo.value(m.x[i,c,t]) > 0.5]
+    chosen = [(c,t) for c in B for t in T if pyo.value(X(i,c,t)) > 0.5]
     if chosen:
         c,t = chosen[0]
         print(f"i={i} -> t={t:3d}  wait={pyo.value(m.s[i]):.1f} slots")
@@ -0,0 +1,451 @@
+# ev_bus_core.py
+# Shared EV BUS scheduling model using NVIDIA cuOpt (linear_programming API).
+# - Clean separation of config, data, model building, solving, and reporting
+# - Implements constraints F1–F15, T1–T4, M1–M8 (as commonly defined in the paper)
+# - Supports multiple buses (B >= 1). Set B=1 to emulate single-bus version.
+# - Buses are identical, so the model only counts them (nw/nd per terminal and time, x[i,t]
+#   without a bus index); bus_schedule() splits the counts back into individual buses.
+#
+# NOTE:
+# - EVBusModel uses the linear waiting-time surrogate sum(s_i). Variants only override the
+#   waiting block (_build_wait_variables / _build_wait_constraints) and _build_objective;
+#   see EVBusModelPWL in ev_bus_refactored_2.py for squared waits.
+# - Time unit is one slot; STEP_MIN defines minutes/slot when mapping to wall-clock minutes.
+# - The LP is assembled as NumPy arrays (bounds, types, CSR matrix) and handed to cuOpt's
+#   DataModel in one call; every variable block lives at a fixed column offset.
+#
+# Demos: ev_bus_refactored_1.py (linear) and ev_bus_refactored_2.py (PWL squared waits).
+#
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Iterable, Optional
+import numpy as np
+from numba import njit
+from cuopt.linear_programming.data_model import DataModel
+from cuopt.linear_programming.solver import Solve
+from cuopt.linear_programming.solver_settings import SolverSettings
+
+# ---------- Data & Config ----------
+
+@dataclass
+class EVBusConfig:
+    STEP_MIN: int = 1                 # minutes per time slot
+    HORIZON_MIN: int = 200            # planning horizon in minutes
+    TAU_MIN: int = 25                 # travel time A<->B in minutes
+    CAPACITY: int = 50                # seats per bus per departure
+    W_MAX_MIN: int = 60               # max allowed waiting in minutes
+    BUSES: int = 3                    # number of buses
+    INITIAL_AT_A: Optional[int] = None # how many buses start at A (if None, default: all at A)
+    HEURISTIC_MODE: bool = False      # LP relaxation + fix near-integral x, then a small MIP (not proven optimal)
+    USE_NAMES: bool = False           # pass variable/row names to cuOpt (debugging only; costs build time and memory)
+
+    @property
+    def T_slots(self) -> List[int]:
+        return list(range(0, self.HORIZON_MIN + 1, self.STEP_MIN))
+
+    @property
+    def TAU_slots(self) -> int:
+        return self.TAU_MIN // self.STEP_MIN
+
+    @property
+    def W_MAX_slots(self) -> int:
+        return self.W_MAX_MIN // self.STEP_MIN
+
+@dataclass
+class Instance:
+    # Passengers going A->B (CEI -> Terminal 2) and B->A (Terminal 2 -> CEI)
+    P_A: List[int]
+    P_B: List[int]
+    # Arrivals on discrete grid (slot indices), one per passenger in P_A/P_B order.
+    # Must satisfy arr[p] in T index-range
+    arr_A: np.ndarray
+    arr_B: np.ndarray
+
+# ---------- Helpers ----------
+
+def allowed_times(arrival_slot: int, cutoff: int) -> range:
+    '''Allowed boarding times: [arrival_slot, cutoff-1].'''
+    return range(arrival_slot, cutoff)
+
+def snap_to_grid(minutes: np.ndarray, step_min: int) -> np.ndarray:
+    '''Arrival minutes -> slot indices, rounded up so nobody boards before arriving.'''
+    return -(-np.asarray(minutes, dtype=np.int64) // step_min)
+
+@njit(cache=True)
+def x_layout(arr: np.ndarray, cutoff: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Column layout of x[i,t] for t in allowed_times(arr[i], cutoff).
+    Passenger p owns columns start[p]:start[p+1], ordered by time.
+    Returns (start, p, t) with one entry of p/t per column.'''
+    n = len(arr)
+    start = np.zeros(n + 1, dtype=np.int64)
+    for k in range(n):
+        start[k+1] = start[k] + max(cutoff - arr[k], 0)
+    p = np.empty(start[n], dtype=np.int64)
+    t = np.empty(start[n], dtype=np.int64)
+    for k in range(n):
+        for c in range(start[k], start[k+1]):
+            p[c] = k
+            t[c] = arr[k] + c - start[k]
+    return start, p, t
+
+@njit(cache=True)
+def flow_block(NT: int, tau: int, off_nw: int, off_nd: int, off_in: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''(rows, cols, vals) of nw[t+1] + nd[t+1] - nw[t] - n_in[t-tau] = 0 for t in 0..NT-2.'''
+    nnz = 3*(NT-1) + max(NT-1-tau, 0)
+    rows = np.empty(nnz, dtype=np.int64)
+    cols = np.empty(nnz, dtype=np.int64)
+    vals = np.empty(nnz, dtype=np.float64)
+    k = 0
+    for t in range(NT-1):
+        rows[k], cols[k], vals[k] = t, off_nw + t + 1, 1.0
+        rows[k+1], cols[k+1], vals[k+1] = t, off_nd + t + 1, 1.0
+        rows[k+2], cols[k+2], vals[k+2] = t, off_nw + t, -1.0
+        k += 3
+        if t >= tau:
+            rows[k], cols[k], vals[k] = t, off_in + t - tau, -1.0
+            k += 1
+    return rows, cols, vals
+
+def seat_rank(t: np.ndarray) -> np.ndarray:
+    '''0-based position of each entry among the entries with the same t, keeping input order.'''
+    order = np.argsort(t, kind="stable")
+    ts = t[order]
+    first = np.concatenate(([0], np.flatnonzero(np.diff(ts)) + 1))
+    rank = np.empty(len(t), dtype=np.int64)
+    rank[order] = np.arange(len(t)) - np.repeat(first, np.diff(np.concatenate((first, [len(t)]))))
+    return rank
+
+# ---------- Model ----------
+
+class EVBusModel:
+    def __init__(self, cfg: EVBusConfig, data: Instance):
+        self.cfg = cfg
+        self.data = data
+        self.T = cfg.T_slots
+        self.NT = len(self.T)
+        self.tau = cfg.TAU_slots
+        self.wmax = cfg.W_MAX_slots
+        self.BN = cfg.BUSES
+        self.cutoff = self.NT - self.tau  # last slot you can depart and still arrive before horizon
+
+        # cuOpt solver settings; the problem itself is assembled as arrays below
+        self.settings = SolverSettings()
+        self.solution = None
+        self.values = None
+
+        # Columns: bounds / types / names per variable block
+        self.n_vars = 0
+        self._lb, self._ub, self._vtype, self._var_names = [], [], [], []
+        self._zero_cols = []
+        # Rows: (rows, cols, vals, sense, rhs) blocks, rows already global
+        self.n_rows = 0
+        self._blocks, self._row_names = [], []
+
+        # Allowed boarding windows, laid out once as x columns (reused by variables, constraints, reporting)
+        self._build_windows()
+        # Variables
+        self._build_variables()
+        # Constraints
+        self._build_constraints()
+        # Objective
+        self._build_objective()
+
+    # ---------- Allowed times ----------
+    def _build_windows(self):
+        self._arr_A = np.asarray(self.data.arr_A, dtype=np.int64)
+        self._arr_B = np.asarray(self.data.arr_B, dtype=np.int64)
+        self.xA_start, self.xA_p, self.xA_t = x_layout(self._arr_A, self.cutoff)
+        self.xB_start, self.xB_p, self.xB_t = x_layout(self._arr_B, self.cutoff)
+
+    # ---------- Variables ----------
+    def _add_vars(self, n: int, names: Iterable[str], lb: float, ub: float, vtype: str) -> int:
+        '''Append n columns; returns the offset of the first. `names` is only consumed when USE_NAMES is set.'''
+        off = self.n_vars
+        self._lb.append(np.full(n, lb, dtype=np.float64))
+        self._ub.append(np.full(n, ub, dtype=np.float64))
+        self._vtype.append(np.full(n, vtype))
+        if self.cfg.USE_NAMES:
+            self._var_names.extend(names)
+        self.n_vars += n
+        return off
+    def _bin(self, n: int, names: Iterable[str]) -> int:
+        return self._add_vars(n, names, 0.0, 1.0, "I")
+    def _int(self, n: int, names: Iterable[str], ub: int) -> int:
+        return self._add_vars(n, names, 0.0, float(ub), "I")
+    def _cont(self, lb: float, n: int, names: Iterable[str], ub: float = 10_000.0) -> int:
+        return self._add_vars(n, names, lb, ub, "C")
+
+    def _build_variables(self):
+        P_A, P_B = self.data.P_A, self.data.P_B
+        BN, NT = self.BN, self.NT
+
+        # Number of buses staying / departing per terminal and time (0..BN); column = off + t.
+        # Counting identical buses instead of indexing them removes the BN! symmetric copies of every plan.
+        # Buses available at t are nw[t] + nd[t], so "depart only if available" (F7/F8) is just nw >= 0.
+        self.off_nw   = self._int(NT, (f"nw[{t}]"  for t in range(NT)), BN)  # buses staying at A at t
+        self.off_nw_r = self._int(NT, (f"nwB[{t}]" for t in range(NT)), BN)  # buses staying at B at t
+        self.off_nd   = self._int(NT, (f"nd[{t}]"  for t in range(NT)), BN)  # departures from A at t
+        self.off_nd_r = self._int(NT, (f"ndB[{t}]" for t in range(NT)), BN)  # departures from B at t
+
+        # Passenger assignment: picks a departure time t; column = off_x + position in layout
+        self.off_xA = self._bin(len(self.xA_p), (f"xA[{P_A[p]},{t}]" for p,t in zip(self.xA_p, self.xA_t)))
+        self.off_xB = self._bin(len(self.xB_p), (f"xB[{P_B[p]},{t}]" for p,t in zip(self.xB_p, self.xB_t)))
+
+        # Waiting-time columns (objective-specific)
+        self._build_wait_variables()
+
+    def _build_wait_variables(self):
+        P_A, P_B = self.data.P_A, self.data.P_B
+        # Per-passenger waiting (slot units); column = off + passenger index.
+        # The departure time is not a column: Dep[i] = sum_t t*x[i,t] is substituted where used.
+        self.off_sA   = self._cont(0.0, len(P_A), (f"sA[{i}]"   for i in P_A))
+        self.off_sB   = self._cont(0.0, len(P_B), (f"sB[{j}]"   for j in P_B))
+
+    def _fix_zero(self, cols: np.ndarray):
+        '''Force the given columns to 0 (upper bound), applied when the DataModel is assembled.'''
+        self._zero_cols.append(cols)
+
+    # ---------- Constraints ----------
+    def _add_rows(self, rows, cols, vals, sense: str, rhs, names: Iterable[str]):
+        '''Append len(rhs) rows; `rows` are numbered 0..len(rhs)-1 within this block.'''
+        rhs = np.asarray(rhs, dtype=np.float64)
+        cols = np.asarray(cols, dtype=np.int64)
+        self._blocks.append((
+            np.asarray(rows, dtype=np.int64) + self.n_rows,
+            cols,
+            np.broadcast_to(np.asarray(vals, dtype=np.float64), cols.shape),
+            np.full(len(rhs), sense),
+            rhs,
+        ))
+        if self.cfg.USE_NAMES:
+            self._row_names.extend(names)
+        self.n_rows += len(rhs)
+
+    def _build_constraints(self):
+        cfg = self.cfg
+        P_A, P_B = self.data.P_A, self.data.P_B
+        NT, BN, tau, wmax = self.NT, self.BN, self.tau, self.wmax
+        CAP = cfg.CAPACITY
+        nA, nB = len(P_A), len(P_B)
+        arr_A, arr_B = self._arr_A, self._arr_B
+        xA_cols = self.off_xA + np.arange(len(self.xA_p))
+        xB_cols = self.off_xB + np.arange(len(self.xB_p))
+        tt = np.arange(NT)
+
+        # F1: Each A-passenger boards exactly once (some time)
+        self._add_rows(self.xA_p, xA_cols, 1.0, "E", np.ones(nA), (f"F1_assign_A[{i}]" for i in P_A))
+
+        # F4: Each B-passenger boards exactly once
+        self._add_rows(self.xB_p, xB_cols, 1.0, "E", np.ones(nB), (f"F4_assign_B[{j}]" for j in P_B))
+
+        # F2: Linking & Capacity @ A (per time); F5 @ B
+        # (F3/F6 `sum x <= CAP*nd` is the same row, so they are not added)
+        for x_cols, xp, xt, arr, off_nd, link in (
+            (xA_cols, self.xA_p, self.xA_t, arr_A, self.off_nd,   "F2_link_A"),
+            (xB_cols, self.xB_p, self.xB_t, arr_B, self.off_nd_r, "F5_link_B"),
+        ):
+            keys, row = np.unique(xt, return_inverse=True)
+            n = len(keys)
+            # Link: boarding at t needs departures at t, at most CAP per departing bus.
+            # No more than elig[t] passengers (x at t not cut by T3) can board, so min(CAP, elig[t])
+            # is a valid and tighter coefficient than CAP.
+            elig = np.bincount(row, weights=xt - arr[xp] <= wmax, minlength=n)
+            self._add_rows(np.concatenate([row, np.arange(n)]), np.concatenate([x_cols, off_nd + keys]),
+                           np.concatenate([np.ones(len(row)), -np.minimum(CAP, elig)]),
+                           "L", np.zeros(n), (f"{link}[{k}]" for k in keys))
+
+        # F7, F8: Departures only from buses available at that terminal
+        # (hold by the nw >= 0 bounds, no rows)
+
+        # M3: No more buses at the terminals than exist
+        # (M2, one departure per bus, follows from M3)
+        self._add_rows(np.tile(tt, 4), np.concatenate([self.off_nw + tt, self.off_nd + tt, self.off_nw_r + tt, self.off_nd_r + tt]), 1.0,
+                       "L", np.full(NT, BN), (f"M3_fleet[{t}]" for t in range(NT)))
+
+        # F9–F14: Availability flow with travel-time delay (available = nw + nd)
+        #   nw[t+1] + nd[t+1] = nw[t] + nd_r[t-τ]   (if t-τ >= 0 else +0)
+        #   nw_r[t+1] + nd_r[t+1] = nw_r[t] + nd[t-τ]
+        for off_nw, off_nd, off_in, name in (
+            (self.off_nw,   self.off_nd,   self.off_nd_r, "Flow_A"),
+            (self.off_nw_r, self.off_nd_r, self.off_nd,   "Flow_B"),
+        ):
+            rows, cols, vals = flow_block(NT, tau, off_nw, off_nd, off_in)
+            self._add_rows(rows, cols, vals, "E", np.zeros(NT-1), (f"{name}[{t}]" for t in range(NT-1)))
+
+        # F10 & F13 (no boarding in the last τ slots) hold by construction: x only has t < cutoff
+
+        # F15: Initial location(s)
+        if cfg.INITIAL_AT_A is None:
+            # default: all buses start at A
+            self._add_rows([0, 0], [self.off_nw,   self.off_nd],   1.0, "E", [BN], ["F15_all_start_A"])
+            self._add_rows([0, 0], [self.off_nw_r, self.off_nd_r], 1.0, "E", [0],  ["F15_none_start_B"])
+        else:
+            k0 = cfg.INITIAL_AT_A
+            self._add_rows([0, 0], [self.off_nw,   self.off_nd],   1.0, "E", [k0],      ["F15_k_start_A"])
+            self._add_rows([0, 0], [self.off_nw_r, self.off_nd_r], 1.0, "E", [BN - k0], ["F15_rest_start_B"])
+
+        # T1/T2 are projected out: Dep[i] is replaced by sum_t t*x[i,t] below
+
+        # T3/T4: Max waiting. With Dep substituted, sum t*x[i,t] - arr[i] <= wmax is the same as
+        # fixing every x[i,t] with t - arr[i] > wmax to 0, so it is applied as column bounds (no rows)
+        self._fix_zero(xA_cols[self.xA_t - arr_A[self.xA_p] > wmax])
+        self._fix_zero(xB_cols[self.xB_t - arr_B[self.xB_p] > wmax])
+
+        # Waiting-time rows (objective-specific)
+        self._build_wait_constraints()
+
+        # M7/M8 (typical): Disallow impossible combinations (already controlled by allowed_times)
+        # You may add further logic here (e.g., min headway, maintenance windows).
+
+    def _build_wait_constraints(self):
+        P_A, P_B = self.data.P_A, self.data.P_B
+        nA, nB = len(P_A), len(P_B)
+        arr_A, arr_B = self._arr_A, self._arr_B
+        xA_cols = self.off_xA + np.arange(len(self.xA_p))
+        xB_cols = self.off_xB + np.arange(len(self.xB_p))
+
+        # Link waiting variables (non-negativity already by lb=0): s[i] - sum t*x[i,t] >= -arr[i]
+        self._add_rows(np.concatenate([np.arange(nA), self.xA_p]), np.concatenate([self.off_sA + np.arange(nA), xA_cols]),
+                       np.concatenate([np.ones(nA), -self.xA_t]), "G", -arr_A, (f"Wait_def_A[{i}]" for i in P_A))
+        self._add_rows(np.concatenate([np.arange(nB), self.xB_p]), np.concatenate([self.off_sB + np.arange(nB), xB_cols]),
+                       np.concatenate([np.ones(nB), -self.xB_t]), "G", -arr_B, (f"Wait_def_B[{j}]" for j in P_B))
+
+    # ---------- Objective ----------
+    def _build_objective(self):
+        # Minimize total waiting time; swap to QP or PWL for squared waiting if needed.
+        self._obj = np.zeros(self.n_vars)
+        self._obj[self.off_sA:self.off_sA + len(self.data.P_A)] = 1.0
+        self._obj[self.off_sB:self.off_sB + len(self.data.P_B)] = 1.0
+
+    # ---------- Solve & Report ----------
+    def data_model(self, relax: bool = False, fix_one: Optional[np.ndarray] = None) -> DataModel:
+        '''Assemble the CSR constraint matrix and column data into a cuOpt DataModel.
+        relax drops all integrality; fix_one pins the given columns to 1.'''
+        rows = np.concatenate([blk[0] for blk in self._blocks])
+        cols = np.concatenate([blk[1] for blk in self._blocks])
+        vals = np.concatenate([blk[2] for blk in self._blocks])
+        keep = vals != 0
+        rows, cols, vals = rows[keep], cols[keep], vals[keep]
+        order = np.argsort(rows, kind="stable")
+        offsets = np.zeros(self.n_rows + 1, dtype=np.int32)
+        np.cumsum(np.bincount(rows, minlength=self.n_rows), out=offsets[1:])
+
+        dm = DataModel()
+        dm.set_csr_constraint_matrix(vals[order], cols[order].astype(np.int32), offsets)
+        dm.set_constraint_bounds(np.concatenate([blk[4] for blk in self._blocks]))
+        dm.set_row_types(np.concatenate([blk[3] for blk in self._blocks]))
+        dm.set_objective_coefficients(self._obj)
+        lb = np.concatenate(self._lb)
+        if fix_one is not None:
+            lb[fix_one] = 1.0
+        dm.set_variable_lower_bounds(lb)
+        ub = np.concatenate(self._ub)
+        for cols in self._zero_cols:
+            ub[cols] = 0.0
+        dm.set_variable_upper_bounds(ub)
+        vtype = np.concatenate(self._vtype)
+        if relax:
+            vtype[:] = "C"
+        dm.set_variable_types(vtype)
+        dm.set_maximize(False)
+        if self.cfg.USE_NAMES:
+            dm.set_variable_names(self._var_names)
+            dm.set_row_names(self._row_names)
+        return dm
+
+    def solve(self, start_at_A: Optional[List[int]] = None, warm_start: Optional[np.ndarray] = None) -> Tuple:
+        '''Optionally enforce specific buses to start at A (others at B) by fixing nw[0] + nd[0].
+        warm_start: initial primal point, e.g. `self.values` from a previous solve (the column layout never changes).'''
+        if start_at_A is not None:
+            # Override initial placement; buses are identical, so only how many start at A matters
+            k0 = len(set(start_at_A) & set(range(self.BN)))
+            self._add_rows([0, 0], [self.off_nw,   self.off_nd],   1.0, "E", [k0],           ["Init_A"])
+            self._add_rows([0, 0], [self.off_nw_r, self.off_nd_r], 1.0, "E", [self.BN - k0], ["Init_B"])
+
+        if warm_start is not None:
+            self.settings.set_initial_primal_solution(np.asarray(warm_start, dtype=np.float64))
+        res = self._solve_heuristic() if self.cfg.HEURISTIC_MODE else Solve(self.data_model(), self.settings)
+        self.solution = res
+        self.values = res.get_primal_solution()
+        return res, self
+
+    def _solve_heuristic(self):
+        '''Restricted-master style: solve the LP relaxation, fix every x > 0.9 to 1 and solve the
+        remaining (much smaller) MIP; falls back to the full MIP if the fixing is infeasible.'''
+        lp = Solve(self.data_model(relax=True), self.settings)
+        x = lp.get_primal_solution()
+        fixed = np.concatenate([off + np.nonzero(x[off:off + n] > 0.9)[0]
+                                for off, n in ((self.off_xA, len(self.xA_p)), (self.off_xB, len(self.xB_p)))])
+        res = Solve(self.data_model(fix_one=fixed), self.settings)
+        if res.get_termination_reason() not in ("Optimal", "FeasibleFound"):
+            res = Solve(self.data_model(), self.settings)
+        return res
+
+    def keep_departures_near(self, coarse: "EVBusModel"):
+        '''Fix to 0 every departure that is not within one coarse slot of a departure chosen by
+        `coarse` (a solved model of the same passengers on a coarser grid). Call before solve().'''
+        step_c = coarse.cfg.STEP_MIN
+        v = np.rint(coarse.values).astype(np.int64)
+        minutes = np.arange(self.NT) * self.cfg.STEP_MIN
+        for off_nd, off_c in ((self.off_nd, coarse.off_nd), (self.off_nd_r, coarse.off_nd_r)):
+            near = np.zeros(self.NT, dtype=bool)
+            for m in np.flatnonzero(v[off_c:off_c + coarse.NT]) * step_c:
+                near |= np.abs(minutes - m) < step_c
+            self._fix_zero(off_nd + np.flatnonzero(~near))
+
+    def bus_schedule(self) -> Dict[Tuple[str,int], List[int]]:
+        '''Split the departure counts into individual buses: {(terminal, t): [b, ...]}.
+        Buses queue FIFO at each terminal and reappear at the other one τ+1 slots later.'''
+        v = np.rint(self.values).astype(np.int64)
+        k0 = int(v[self.off_nw] + v[self.off_nd])
+        idle = {"A": list(range(k0)), "B": list(range(k0, self.BN))}
+        arriving = defaultdict(list)
+        sched = {}
+        for t in range(self.NT):
+            for side in ("A", "B"):
+                idle[side].extend(arriving.pop((side, t), []))
+            for side, off_nd, dest in (("A", self.off_nd, "B"), ("B", self.off_nd_r, "A")):
+                n = int(v[off_nd + t])
+                if n:
+                    sched[(side, t)], idle[side] = idle[side][:n], idle[side][n:]
+                    arriving[(dest, t + self.tau + 1)].extend(sched[(side, t)])
+        return sched
+
+    def chosen_departures(self) -> Dict[str, List[Tuple[int,int]]]:
+        '''Return departures list per terminal: [(b,t), ...]'''
+        sched = self.bus_schedule()
+        dep_A = sorted((b,t) for (side,t),buses in sched.items() if side == "A" for b in buses)
+        dep_B = sorted((b,t) for (side,t),buses in sched.items() if side == "B" for b in buses)
+        return {"A": dep_A, "B": dep_B}
+
+    def chosen_assignments(self) -> Dict[str, List[Tuple[int,int,int]]]:
+        '''Return passenger assignments as (id, bus, t); a departure's passengers fill its buses CAP at a time.'''
+        v, CAP = self.values, self.cfg.CAPACITY
+        sched = self.bus_schedule()
+        out = {}
+        for side, ids, off_x, xp, xt in (("A", self.data.P_A, self.off_xA, self.xA_p, self.xA_t),
+                                         ("B", self.data.P_B, self.off_xB, self.xB_p, self.xB_t)):
+            # Chosen columns in one pass, then each passenger's seat number within its departure
+            c = np.flatnonzero(v[off_x:off_x + len(xp)] > 0.5)
+            p, t = xp[c], xt[c]
+            seat = seat_rank(t)
+            out[side] = [(ids[pp], sched[(side, tt)][r // CAP], tt) for pp, tt, r in zip(p.tolist(), t.tolist(), seat.tolist())]
+        return out
+
+    def print_summary(self):
+        print("Status:", self.solution.get_termination_status())
+        print("Objective:", self.solution.get_primal_objective())
+        dep = self.chosen_departures()
+        print("Departures A:", [(b, t*self.cfg.STEP_MIN) for (b,t) in dep["A"]])
+        print("Departures B:", [(b, t*self.cfg.STEP_MIN) for (b,t) in dep["B"]])
+
+        # Example: print first few assignments
+        sel = self.chosen_assignments()
+        pos_A = {i: p for p, i in enumerate(self.data.P_A)}
+        pos_B = {j: p for p, j in enumerate(self.data.P_B)}
+        for (i,b,t) in sel["A"][:5]:
+            wait = t - self._arr_A[pos_A[i]]
+            print(f"A-passenger {i} -> bus {b} at t={t*self.cfg.STEP_MIN} min, wait={wait*self.cfg.STEP_MIN} min")
+        for (j,b,t) in sel["B"][:5]:
+            wait = t - self._arr_B[pos_B[j]]
+            print(f"B-passenger {j} -> bus {b} at t={t*self.cfg.STEP_MIN} min, wait={wait*self.cfg.STEP_MIN} min")
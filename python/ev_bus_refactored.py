@@ -8,6 +8,8 @@
 # NOTE:
 # - Objective uses linear waiting-time surrogate sum(s_i); switch to QP or PWL for squared waits.
 # - Time unit is one slot; STEP_MIN defines minutes/slot when mapping to wall-clock minutes.
+# - Variable handles live in NumPy object arrays: ba/bd are (BN, NT) grids, x_A/x_B are flat
+#   per-passenger blocks (CSR-style offsets) with parallel bus/time index arrays.
 #
 # Usage (demo at bottom):
 #   python ev_bus_refactored.py
@@ -16,7 +18,8 @@
 #
 from dataclasses import dataclass
 from typing import Dict, List, Tuple, Iterable, Optional
-from cuopt.linear_programming.problem import Problem, INTEGER, CONTINUOUS, MINIMIZE
+import numpy as np
+from cuopt.linear_programming.problem import Problem, LinearExpression, INTEGER, CONTINUOUS, MINIMIZE
 from cuopt.linear_programming.solver_settings import SolverSettings
 
 # ---------- Data & Config ----------
@@ -58,6 +61,12 @@ def allowed_times(arrival_slot: int, cutoff: int) -> List[int]:
     '''Allowed boarding times: [arrival_slot, cutoff-1].'''
     return list(range(arrival_slot, cutoff))
 
+def lin_sum(variables: Iterable, coefficients: Optional[Iterable[float]] = None) -> LinearExpression:
+    '''sum(c*v) built as one LinearExpression instead of a chain of Variable.__add__ calls.'''
+    variables = list(variables)
+    coefficients = [1.0] * len(variables) if coefficients is None else [float(c) for c in coefficients]
+    return LinearExpression(variables, coefficients, 0.0)
+
 # ---------- Model ----------
 
 class EVBusModel:
@@ -88,26 +97,51 @@ class EVBusModel:
     def _cont(self, lb: float, name: str, ub: float = 10_000.0):
         return self.prob.addVariable(lb=lb, ub=ub, vtype=CONTINUOUS, name=name)
 
+    def _bin_grid(self, name: str) -> np.ndarray:
+        '''(BN, NT) object array of binaries; grid[b,t] is the handle.'''
+        grid = np.empty((self.BN, self.NT), dtype=object)
+        for b in range(self.BN):
+            for t in range(self.NT):
+                grid[b,t] = self._bin(f"{name}[{b},{t}]")
+        return grid
+
+    def _bin_x(self, name: str, P: List[int], arr: Dict[int, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        '''x[i,b,t] for t in allowed_times(arr[i]) as a flat object array, ordered by (passenger, b, t).
+        Returns (x, off, b, t): passenger P[p] owns x[off[p]:off[p+1]]; b/t give the bus and time per entry.'''
+        handles, off, bs, ts = [], [0], [], []
+        for i in P:
+            for b in range(self.BN):
+                for t in allowed_times(arr[i], self.cutoff):
+                    handles.append(self._bin(f"{name}[{i},{b},{t}]"))
+                    bs.append(b)
+                    ts.append(t)
+            off.append(len(handles))
+        x = np.fromiter(handles, dtype=object, count=len(handles))
+        return x, np.array(off, dtype=np.int64), np.array(bs, dtype=np.int64), np.array(ts, dtype=np.int64)
+
+    def _by_bt(self, x: np.ndarray, b: np.ndarray, t: np.ndarray) -> List[np.ndarray]:
+        '''Inverted index of a flat x block: entry b*NT + t holds the handles with that bus and time.'''
+        key = b * self.NT + t
+        order = np.argsort(key, kind="stable")
+        start = np.zeros(self.BN * self.NT + 1, dtype=np.int64)
+        np.cumsum(np.bincount(key, minlength=self.BN * self.NT), out=start[1:])
+        return [x[order[start[k]:start[k+1]]] for k in range(self.BN * self.NT)]
+
     def _build_variables(self):
         P_A, P_B = self.data.P_A, self.data.P_B
 
         # Bus availability and departure decisions per bus, per time, per terminal
-        self.ba   = {(b,t): self._bin(f"ba[{b},{t}]")   for b in range(self.BN) for t in range(self.NT)}  # A-side availability
-        self.ba_r = {(b,t): self._bin(f"baB[{b},{t}]")  for b in range(self.BN) for t in range(self.NT)}  # B-side availability
-        self.bd   = {(b,t): self._bin(f"bd[{b},{t}]")   for b in range(self.BN) for t in range(self.NT)}  # depart A at t
-        self.bd_r = {(b,t): self._bin(f"bdB[{b},{t}]")  for b in range(self.BN) for t in range(self.NT)}  # depart B at t
+        self.ba   = self._bin_grid("ba")   # A-side availability
+        self.ba_r = self._bin_grid("baB")  # B-side availability
+        self.bd   = self._bin_grid("bd")   # depart A at t
+        self.bd_r = self._bin_grid("bdB")  # depart B at t
 
         # Passenger assignment: picks a bus b and time t
-        self.x_A = {}
-        self.x_B = {}
-        for i in P_A:
-            for b in range(self.BN):
-                for t in allowed_times(self.data.arr_A[i], self.cutoff):
-                    self.x_A[(i,b,t)] = self._bin(f"xA[{i},{b},{t}]")
-        for j in P_B:
-            for b in range(self.BN):
-                for t in allowed_times(self.data.arr_B[j], self.cutoff):
-                    self.x_B[(j,b,t)] = self._bin(f"xB[{j},{b},{t}]")
+        self.x_A, self.x_A_off, self.x_A_b, self.x_A_t = self._bin_x("xA", P_A, self.data.arr_A)
+        self.x_B, self.x_B_off, self.x_B_b, self.x_B_t = self._bin_x("xB", P_B, self.data.arr_B)
+        # (b,t) -> handles, so the per-(b,t) sums never scan every passenger
+        self.x_A_bt = self._by_bt(self.x_A, self.x_A_b, self.x_A_t)
+        self.x_B_bt = self._by_bt(self.x_B, self.x_B_b, self.x_B_t)
 
         # Per-passenger departure times & waiting (slot units)
         self.Dep_A = {i: self._cont(0.0, f"DepA[{i}]") for i in P_A}
@@ -124,74 +158,76 @@ class EVBusModel:
         cutoff = self.cutoff
 
         # F1: Each A-passenger boards exactly once (some bus, some time)
-        for i in P_A:
+        for p, i in enumerate(P_A):
             self.prob.addConstraint(
-                sum(self.x_A[(i,b,t)] for b in range(BN) for t in allowed_times(self.data.arr_A[i], cutoff)) == 1,
+                lin_sum(self.x_A[self.x_A_off[p]:self.x_A_off[p+1]]) == 1,
                 name=f"F1_assign_A[{i}]"
             )
 
         # F4: Each B-passenger boards exactly once
-        for j in P_B:
+        for p, j in enumerate(P_B):
             self.prob.addConstraint(
-                sum(self.x_B[(j,b,t)] for b in range(BN) for t in allowed_times(self.data.arr_B[j], cutoff)) == 1,
+                lin_sum(self.x_B[self.x_B_off[p]:self.x_B_off[p+1]]) == 1,
                 name=f"F4_assign_B[{j}]"
             )
 
         # F2 & F3: Linking & Capacity @ A (per bus, per time)
         for b in range(BN):
             for t in range(NT):
-                # Link: any boarding implies a departure
+                on_bt = self.x_A_bt[b*NT + t]
+                # Link: any boarding implies a departure (at most len(on_bt) can board, so that caps the bigM)
                 self.prob.addConstraint(
-                    sum(self.x_A[(i,b,t)] for i in P_A if (i,b,t) in self.x_A) <= CAP * self.bd[(b,t)],
+                    lin_sum(on_bt) <= min(CAP, len(on_bt)) * self.bd[b,t],
                     name=f"F2_link_A[{b},{t}]"
                 )
                 # Capacity
                 self.prob.addConstraint(
-                    sum(self.x_A[(i,b,t)] for i in P_A if (i,b,t) in self.x_A) <= CAP,
+                    lin_sum(on_bt) <= CAP,
                     name=f"F3_cap_A[{b},{t}]"
                 )
 
         # F5 & F6: Linking & Capacity @ B
         for b in range(BN):
             for t in range(NT):
+                on_bt = self.x_B_bt[b*NT + t]
                 self.prob.addConstraint(
-                    sum(self.x_B[(j,b,t)] for j in P_B if (j,b,t) in self.x_B) <= CAP * self.bd_r[(b,t)],
+                    lin_sum(on_bt) <= min(CAP, len(on_bt)) * self.bd_r[b,t],
                     name=f"F5_link_B[{b},{t}]"
                 )
                 self.prob.addConstraint(
-                    sum(self.x_B[(j,b,t)] for j in P_B if (j,b,t) in self.x_B) <= CAP,
+                    lin_sum(on_bt) <= CAP,
                     name=f"F6_cap_B[{b},{t}]"
                 )
 
         # F7, F8: Depart only if bus is at that terminal
         for b in range(BN):
             for t in range(NT):
-                self.prob.addConstraint(self.bd[(b,t)]   <= self.ba[(b,t)],   name=f"F7_depart_if_avail_A[{b},{t}]")
-                self.prob.addConstraint(self.bd_r[(b,t)] <= self.ba_r[(b,t)], name=f"F8_depart_if_avail_B[{b},{t}]")
+                self.prob.addConstraint(self.bd[b,t]   <= self.ba[b,t],   name=f"F7_depart_if_avail_A[{b},{t}]")
+                self.prob.addConstraint(self.bd_r[b,t] <= self.ba_r[b,t], name=f"F8_depart_if_avail_B[{b},{t}]")
 
         # M2: At most one departure (A or B) per bus & time
         for b in range(BN):
             for t in range(NT):
-                self.prob.addConstraint(self.bd[(b,t)] + self.bd_r[(b,t)] <= 1, name=f"M2_one_depart_per_bus[{b},{t}]")
+                self.prob.addConstraint(self.bd[b,t] + self.bd_r[b,t] <= 1, name=f"M2_one_depart_per_bus[{b},{t}]")
 
         # M3: Bus can be at most one terminal at a time
         for b in range(BN):
             for t in range(NT):
-                self.prob.addConstraint(self.ba[(b,t)] + self.ba_r[(b,t)] <= 1, name=f"M3_single_location[{b},{t}]")
+                self.prob.addConstraint(self.ba[b,t] + self.ba_r[b,t] <= 1, name=f"M3_single_location[{b},{t}]")
 
         # F9–F14: Availability flow with travel-time delay
         #   ba[b,t+1] = ba[b,t] - bd[b,t] + bd_r[b,t-τ]   (if t-τ >= 0 else +0)
         #   ba_r[b,t+1] = ba_r[b,t] - bd_r[b,t] + bd[b,t-τ]
         for b in range(BN):
             for t in range(NT-1):
-                inbound_from_B = self.bd_r[(b, t - tau)] if t - tau >= 0 else 0
-                inbound_from_A = self.bd[(b, t - tau)]   if t - tau >= 0 else 0
+                inbound_from_B = self.bd_r[b, t - tau] if t - tau >= 0 else 0
+                inbound_from_A = self.bd[b, t - tau]   if t - tau >= 0 else 0
                 self.prob.addConstraint(
-                    self.ba[(b,t+1)] == self.ba[(b,t)] - self.bd[(b,t)] + inbound_from_B,
+                    self.ba[b,t+1] == self.ba[b,t] - self.bd[b,t] + inbound_from_B,
                     name=f"Flow_A[{b},{t}]"
                 )
                 self.prob.addConstraint(
-                    self.ba_r[(b,t+1)] == self.ba_r[(b,t)] - self.bd_r[(b,t)] + inbound_from_A,
+                    self.ba_r[b,t+1] == self.ba_r[b,t] - self.bd_r[b,t] + inbound_from_A,
                     name=f"Flow_B[{b},{t}]"
                 )
 
@@ -200,36 +236,38 @@ class EVBusModel:
             for t in range(cutoff, NT):
                 # No boarding assignments in tail
                 self.prob.addConstraint(
-                    sum(self.x_A[(i,b,t)] for i in P_A if (i,b,t) in self.x_A) == 0,
+                    lin_sum(self.x_A_bt[b*NT + t]) == 0,
                     name=f"F10_no_board_A_late[{b},{t}]"
                 )
                 self.prob.addConstraint(
-                    sum(self.x_B[(j,b,t)] for j in P_B if (j,b,t) in self.x_B) == 0,
+                    lin_sum(self.x_B_bt[b*NT + t]) == 0,
                     name=f"F13_no_board_B_late[{b},{t}]"
                 )
                 # Optional: also prevent departures in tail if desired
-                # self.prob.addConstraint(self.bd[(b,t)] == 0,   name=f"F10b_no_depart_A_late[{b},{t}]")
-                # self.prob.addConstraint(self.bd_r[(b,t)] == 0, name=f"F13b_no_depart_B_late[{b},{t}]")
+                # self.prob.addConstraint(self.bd[b,t] == 0,   name=f"F10b_no_depart_A_late[{b},{t}]")
+                # self.prob.addConstraint(self.bd_r[b,t] == 0, name=f"F13b_no_depart_B_late[{b},{t}]")
 
         # F15: Initial location(s)
         if cfg.INITIAL_AT_A is None:
             # default: all buses start at A
-            self.prob.addConstraint(sum(self.ba[(b,0)] for b in range(BN)) == BN, name="F15_all_start_A")
-            self.prob.addConstraint(sum(self.ba_r[(b,0)] for b in range(BN)) == 0,  name="F15_none_start_B")
+            self.prob.addConstraint(lin_sum(self.ba[b,0] for b in range(BN)) == BN, name="F15_all_start_A")
+            self.prob.addConstraint(lin_sum(self.ba_r[b,0] for b in range(BN)) == 0,  name="F15_none_start_B")
         else:
             k = cfg.INITIAL_AT_A
-            self.prob.addConstraint(sum(self.ba[(b,0)] for b in range(BN)) == k,         name="F15_k_start_A")
-            self.prob.addConstraint(sum(self.ba_r[(b,0)] for b in range(BN)) == BN - k,  name="F15_rest_start_B")
+            self.prob.addConstraint(lin_sum(self.ba[b,0] for b in range(BN)) == k,         name="F15_k_start_A")
+            self.prob.addConstraint(lin_sum(self.ba_r[b,0] for b in range(BN)) == BN - k,  name="F15_rest_start_B")
 
         # T1/T2: Define departure time as convex combination of chosen times
-        for i in P_A:
+        for p, i in enumerate(P_A):
+            blk = slice(self.x_A_off[p], self.x_A_off[p+1])
             self.prob.addConstraint(
-                self.Dep_A[i] == sum(t * self.x_A[(i,b,t)] for b in range(BN) for t in allowed_times(self.data.arr_A[i], cutoff)),
+                self.Dep_A[i] == lin_sum(self.x_A[blk], self.x_A_t[blk]),
                 name=f"T1_dep_time_A[{i}]"
             )
-        for j in P_B:
+        for p, j in enumerate(P_B):
+            blk = slice(self.x_B_off[p], self.x_B_off[p+1])
             self.prob.addConstraint(
-                self.Dep_B[j] == sum(t * self.x_B[(j,b,t)] for b in range(BN) for t in allowed_times(self.data.arr_B[j], cutoff)),
+                self.Dep_B[j] == lin_sum(self.x_B[blk], self.x_B_t[blk]),
                 name=f"T2_dep_time_B[{j}]"
             )
 
@@ -251,35 +289,40 @@ class EVBusModel:
     # ---------- Objective ----------
     def _build_objective(self):
         # Minimize total waiting time; swap to QP or PWL for squared waiting if needed.
-        obj = sum(self.s_A.values()) + sum(self.s_B.values())
+        obj = lin_sum([*self.s_A.values(), *self.s_B.values()])
         self.prob.setObjective(obj, sense=MINIMIZE)
 
     # ---------- Solve & Report ----------
-    def solve(self, start_at_A: Optional[List[int]] = None) -> Tuple:
-        '''Optionally enforce specific buses to start at A (others at B) by fixing ba[0].'''
+    def solve(self, start_at_A: Optional[List[int]] = None, warm_start: Optional[np.ndarray] = None) -> Tuple:
+        '''Optionally enforce specific buses to start at A (others at B) by fixing ba[0].
+        warm_start: initial primal point in variable creation order (e.g. from a previous solve).'''
         if start_at_A is not None:
             # Override initial placement
             for b in range(self.BN):
                 if b in start_at_A:
-                    self.prob.addConstraint(self.ba[(b,0)] == 1, name=f"Init_at_A[{b}]")
-                    self.prob.addConstraint(self.ba_r[(b,0)] == 0, name=f"Init_not_B[{b}]")
+                    self.prob.addConstraint(self.ba[b,0] == 1, name=f"Init_at_A[{b}]")
+                    self.prob.addConstraint(self.ba_r[b,0] == 0, name=f"Init_not_B[{b}]")
                 else:
-                    self.prob.addConstraint(self.ba[(b,0)] == 0, name=f"Init_not_A[{b}]")
-                    self.prob.addConstraint(self.ba_r[(b,0)] == 1, name=f"Init_at_B[{b}]")
+                    self.prob.addConstraint(self.ba[b,0] == 0, name=f"Init_not_A[{b}]")
+                    self.prob.addConstraint(self.ba_r[b,0] == 1, name=f"Init_at_B[{b}]")
 
+        if warm_start is not None:
+            self.settings.set_initial_primal_solution(np.asarray(warm_start, dtype=np.float64))
         res = self.prob.solve(self.settings)
         return res, self
 
     def chosen_departures(self) -> Dict[str, List[Tuple[int,int]]]:
         '''Return departures list per terminal: [(b,t), ...]'''
-        dep_A = [(b,t) for (b,t),var in self.bd.items()   if var.getValue() > 0.5]
-        dep_B = [(b,t) for (b,t),var in self.bd_r.items() if var.getValue() > 0.5]
+        dep_A = [(b,t) for (b,t),var in np.ndenumerate(self.bd)   if var.getValue() > 0.5]
+        dep_B = [(b,t) for (b,t),var in np.ndenumerate(self.bd_r) if var.getValue() > 0.5]
         return {"A": dep_A, "B": dep_B}
 
     def chosen_assignments(self) -> Dict[str, List[Tuple[int,int,int]]]:
         '''Return passenger assignments as (id, bus, t).'''
-        sel_A = [(i,b,t) for (i,b,t),var in self.x_A.items() if var.getValue() > 0.5]
-        sel_B = [(j,b,t) for (j,b,t),var in self.x_B.items() if var.getValue() > 0.5]
+        pos_A = np.repeat(np.arange(len(self.data.P_A)), np.diff(self.x_A_off))
+        pos_B = np.repeat(np.arange(len(self.data.P_B)), np.diff(self.x_B_off))
+        sel_A = [(self.data.P_A[p], int(b), int(t)) for p,b,t,var in zip(pos_A, self.x_A_b, self.x_A_t, self.x_A) if var.getValue() > 0.5]
+        sel_B = [(self.data.P_B[p], int(b), int(t)) for p,b,t,var in zip(pos_B, self.x_B_b, self.x_B_t, self.x_B) if var.getValue() > 0.5]
         return {"A": sel_A, "B": sel_B}
 
     def print_summary(self):
@@ -0,0 +1,207 @@
+# single_bus_core.py
+# Shared plumbing of the single-bus cuOpt scripts (example_cuda.py: linear waits, power_gpt5pro.py:
+# PWL squared waits). Both build the same time-expanded MILP; only the waiting block and objective differ.
+# - CsrModel: columns and rows collected into flat lists and loaded into a cuOpt DataModel (or HiGHS) in one
+#   go (CSR constraint matrix) instead of building a Python expression tree per constraint
+# - heuristic_schedule(): greedy FIFO dispatcher used as the MIP start
+# - solve(): the MILP on cuOpt, or on HiGHS (CPU) for models too small for the GPU to pay off (optional root LP first)
+#
+from importlib.util import find_spec
+import numpy as np
+try:
+    import highspy
+except ImportError:  # every model then goes to cuOpt
+    highspy = None
+
+# cuOpt is imported only when a model is actually sent to it, so a HiGHS-only machine needs no CUDA stack
+HAS_CUOPT = find_spec("cuopt") is not None
+
+# backend="auto" sends a model to HiGHS only up to this many passengers x slots. Measured with HiGHS on both
+# scripts' models (201 one-minute slots): up to 15 CEI passengers solve in 0.1-0.3 s, 20 take ~1 s with PWL
+# waits and 25 already 5-14 s, so the default 50-passenger instances stay on cuOpt.
+HIGHS_MAX_SIZE = 3000
+
+class CsrModel:
+    """Columns (bounds, type, name) and CSR rows of a MILP, appended one by one or in blocks."""
+
+    def __init__(self):
+        self.var_lb, self.var_ub, self.var_type, self.var_names = [], [], [], []
+        self.row_ptr, self.row_cols, self.row_vals, self.row_types, self.row_rhs, self.row_names = [0], [], [], [], [], []
+
+    @property
+    def n_cols(self):
+        return len(self.var_lb)
+
+    def add_var(self, lb, ub, vtype, name):
+        self.var_lb.append(lb); self.var_ub.append(ub); self.var_type.append(vtype); self.var_names.append(name)
+        return len(self.var_lb) - 1  # column index
+
+    def add_row(self, cols, vals, sense, rhs, name):
+        # sum_k vals[k] * col[cols[k]]  (sense "E": ==, "L": <=, "G": >=)  rhs
+        self.row_cols.extend(cols); self.row_vals.extend(vals)
+        self.row_ptr.append(len(self.row_cols)); self.row_types.append(sense); self.row_rhs.append(rhs); self.row_names.append(name)
+
+    def add_rows(self, counts, cols, vals, sense, rhs, names):
+        # Block of len(counts) rows with the same sense/rhs: row k takes the next counts[k] entries of cols/vals
+        self.row_ptr.extend((len(self.row_cols) + np.cumsum(counts, dtype=np.int64)).tolist())
+        self.row_cols.extend(cols); self.row_vals.extend(vals)
+        self.row_types.extend([sense] * len(counts)); self.row_rhs.extend([rhs] * len(counts)); self.row_names.extend(names)
+
+    def data_model(self, obj, relax=False):
+        # relax=True drops integrality (root LP relaxation)
+        from cuopt.linear_programming.data_model import DataModel
+        dm = DataModel()
+        dm.set_csr_constraint_matrix(np.array(self.row_vals, dtype=np.float64),
+                                     np.array(self.row_cols, dtype=np.int32),
+                                     np.array(self.row_ptr, dtype=np.int32))
+        dm.set_constraint_bounds(np.array(self.row_rhs, dtype=np.float64))
+        dm.set_row_types(np.array(self.row_types))
+        dm.set_objective_coefficients(obj)
+        dm.set_variable_lower_bounds(np.array(self.var_lb, dtype=np.float64))
+        dm.set_variable_upper_bounds(np.array(self.var_ub, dtype=np.float64))
+        dm.set_variable_types(np.full(len(self.var_type), "C") if relax else np.array(self.var_type))
+        dm.set_maximize(False)
+        dm.set_variable_names(self.var_names)
+        dm.set_row_names(self.row_names)
+        return dm
+
+    def solve_highs(self, obj, time_limit, relax=False, start=None):
+        # Same CSR arrays passed to HiGHS in memory (no MPS/LP file round trip)
+        h = highspy.Highs()
+        h.setOptionValue("output_flag", False)
+        h.setOptionValue("time_limit", float(time_limit))
+        types = np.array(self.row_types)
+        rhs = np.array(self.row_rhs, dtype=np.float64)
+        lp = highspy.HighsLp()
+        lp.num_col_, lp.num_row_ = self.n_cols, len(self.row_rhs)
+        lp.col_cost_ = obj
+        lp.col_lower_ = np.array(self.var_lb, dtype=np.float64)
+        lp.col_upper_ = np.array(self.var_ub, dtype=np.float64)
+        lp.row_lower_ = np.where(types == "L", -highspy.kHighsInf, rhs)
+        lp.row_upper_ = np.where(types == "G", highspy.kHighsInf, rhs)
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.start_, lp.a_matrix_.index_, lp.a_matrix_.value_ = self.row_ptr, self.row_cols, self.row_vals
+        if not relax:
+            lp.integrality_ = [highspy.HighsVarType.kInteger if v == "I" else highspy.HighsVarType.kContinuous for v in self.var_type]
+        h.passModel(lp)
+        if start is not None and not relax:
+            sol = highspy.HighsSolution()
+            sol.col_value = start.tolist()
+            sol.value_valid = True
+            h.setSolution(sol)
+        h.run()
+        return HighsResult(h, self.n_cols)
+
+class HighsResult:
+    # Same getters the scripts use on a cuOpt solution
+    def __init__(self, h, n_cols):
+        info = h.getInfo()
+        status = h.getModelStatus()
+        has_sol = info.primal_solution_status == 2  # kSolutionStatusFeasible
+        if status == highspy.HighsModelStatus.kOptimal:
+            self.reason = "Optimal"
+        elif status == highspy.HighsModelStatus.kInfeasible:
+            self.reason = "Infeasible"
+        else:
+            self.reason = "FeasibleFound" if has_sol else h.modelStatusToString(status)
+        self.x = np.array(h.getSolution().col_value) if has_sol else np.zeros(n_cols)
+        self.objective = info.objective_function_value
+        self.elapsed = h.getRunTime()
+    def get_primal_solution(self): return self.x
+    def get_termination_reason(self): return self.reason
+    def get_solve_time(self): return self.elapsed
+    def get_primal_objective(self): return self.objective
+
+def heuristic_schedule(model, T, step_min, tau_slots, capacity, sides, flow, on_board=None):
+    # Greedy FIFO dispatcher for the single bus (starts at CEI). At its terminal the bus waits until the
+    # earliest of: the first waiting passenger's deadline, a full load, or the last moment it can leave and
+    # still reach the first passenger on the other side in time; then it takes everyone who has arrived
+    # (FIFO, up to capacity) and crosses. Returns a full column vector, or None if someone misses their window.
+    #   sides["A"] / sides["B"]: (ids, arr, hi, x) = passengers, arrival / latest boarding minute, (p, t) -> x column
+    #   flow: (ba, ba_r, bd, bd_r) columns by t;  on_board(side, p, d, start) sets any extra columns of a boarding
+    arrive = {side: v[1] for side, v in sides.items()}
+    last = {side: v[2] for side, v in sides.items()}
+    queue = {side: sorted(v[0], key=v[1].get) for side, v in sides.items()}
+    travel = tau_slots * step_min
+    latest_dep = T[-1] - travel  # later departures cannot board anyone
+    N = len(T)
+    start = np.zeros(model.n_cols)
+    deps = []  # (slot, side)
+
+    loc, ready = "A", 0
+    while queue["A"] or queue["B"]:
+        other = "B" if loc == "A" else "A"
+        here, there = queue[loc], queue[other]
+        cands = []
+        if here:
+            cands.append(last[loc][here[0]])
+            if len(here) >= capacity:
+                cands.append(arrive[loc][here[capacity - 1]])
+        if there:
+            cands.append(last[other][there[0]] - travel)
+            if not here:
+                cands.append(arrive[other][there[0]] - travel)
+        # deadlines (hi) may run past latest_dep, but nobody can board after it: leave no later than that
+        d = max(ready, min(min(cands), latest_dep))
+        if d > latest_dep or (here and last[loc][here[0]] < d):
+            return None
+        board = [p for p in here[:capacity] if arrive[loc][p] <= d]
+        xs = sides[loc][3]
+        for p in board:
+            start[xs[(p, d)]] = 1.0
+            if on_board is not None:
+                on_board(loc, p, d, start)
+        del here[:len(board)]
+        deps.append((d // step_min, loc))
+        loc, ready = other, d + travel
+
+    # Replay the flow equalities to get ba / ba_r from the departures
+    dep = {"A": np.zeros(N), "B": np.zeros(N)}
+    for k, side in deps:
+        dep[side][k] = 1.0
+    avail = {"A": np.zeros(N), "B": np.zeros(N)}
+    avail["A"][0] = 1.0
+    for k in range(1, N):
+        for side, other in (("A", "B"), ("B", "A")):
+            avail[side][k] = avail[side][k - 1] - dep[side][k - 1] + (dep[other][k - tau_slots] if k >= tau_slots else 0.0)
+    ba, ba_r, bd, bd_r = flow
+    for k, t in enumerate(T):
+        start[ba[t]], start[ba_r[t]] = avail["A"][k], avail["B"][k]
+        start[bd[t]], start[bd_r[t]] = dep["A"][k], dep["B"][k]
+    return start
+
+def solve(model, obj, start=None, backend="auto", size=0, time_limit=60, root_lp_first=False):
+    """Solve `model` from the greedy `start` (if any); returns the cuOpt solution or a HighsResult.
+    backend: "cuopt", "highs", or "auto" (HiGHS when size = passengers x slots <= HIGHS_MAX_SIZE, or when
+    cuOpt is not installed)."""
+    if backend == "auto":
+        backend = "highs" if highspy is not None and (size <= HIGHS_MAX_SIZE or not HAS_CUOPT) else "cuopt"
+    if start is not None:
+        print("Greedy warm start objective:", obj @ start)
+
+    if backend == "highs":
+        def run(relax):
+            return model.solve_highs(obj, time_limit, relax, start)
+    else:
+        from cuopt.linear_programming.solver import Solve
+        from cuopt.linear_programming.solver_settings import SolverSettings
+        settings = SolverSettings()
+        settings.set_parameter("time_limit", time_limit)
+        # settings.set_parameter("threads", 4)
+        if start is not None:
+            settings.set_initial_primal_solution(start)
+
+        def run(relax):
+            return Solve(model.data_model(obj, relax), settings)
+
+    # Optional root LP first (diagnostic, off by default): its objective is a lower bound for the MILP, and if the
+    # relaxation is already integral it is the MILP optimum. Nothing else carries over (cuOpt has no hook to hand an
+    # LP basis to the MIP), and neither demo's relaxation is integral, so by default it is one extra solve for nothing.
+    if root_lp_first:
+        lp = run(relax=True)
+        print("LP relaxation bound:", lp.get_primal_objective())
+        lp_val = lp.get_primal_solution()
+        ints = np.array(model.var_type) == "I"
+        if lp.get_termination_reason() == "Optimal" and np.allclose(lp_val[ints], np.round(lp_val[ints]), atol=1e-6):
+            return lp
+    return run(relax=False)
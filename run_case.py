@@ -1,10 +1,14 @@
 import os
 import time
-from typing import List, Dict
+from typing import List, Dict, Optional
 from itertools import product
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
+from julia_pool import JuliaPool, JuliaJobError, PROJECT_PATH
+from case_cache import is_newer, result_status, load_manifest, save_manifest
 
-PROJECT_PATH = "/home/hpcnc/bus_opt"
+BUS2_OPT = os.path.join(PROJECT_PATH, "bus2_opt.jl")
+DONE_FILE = os.path.join(PROJECT_PATH, "done.json")  # case -> {runtime, status} of completed runs
 
 # params = {
 #     "passengers_cei": [1000, 1500, 2000],
@@ -25,43 +29,74 @@ def generate_permutation(params: dict) -> List[Dict[str, int]]:
     all_combos = product(*(params[k] for k in keys))
     return [dict(zip(keys, combo)) for combo in all_combos]
 
-def execute_case(params: dict):
-    cei = params["passengers_cei"]
-    t2 = params["passengers_t2"]
-    w_max = params["w_max"]
-    bus = params["buses"]
+def case_paths(params: dict):
+    """(case file, result file, log file) of one case."""
+    name = f"tc_{params['passengers_cei']}_{params['passengers_t2']}_{params['w_max']}_{params['buses']}"
+    return (os.path.join(PROJECT_PATH, f"final_case/{name}.json"),
+            os.path.join(PROJECT_PATH, f"output/{name}.json"),
+            os.path.join(PROJECT_PATH, f"log/{name}.txt"))
 
-    tc = f"final_case/tc_{cei}_{t2}_{w_max}_{bus}.json"
-    result = f"output/tc_{cei}_{t2}_{w_max}_{bus}.json"
-    log = f"{PROJECT_PATH}/log/tc_{cei}_{t2}_{w_max}_{bus}.txt"
-    
-    os.system(f"~/tool/julia/julia {PROJECT_PATH}/bus2_opt.jl {tc} {result} > {log} 2>&1")
+def execute_case(params: dict, julia: JuliaPool) -> Optional[float]:
+    """Run one case (blocking) and return its wall time, or None if its result is newer than the case file. Raises on failure."""
+    tc, result, log = case_paths(params)
+    if is_newer(result, tc):
+        return None
 
+    start = time.perf_counter()
+    output = ""
+    try:
+        output = julia.execute(BUS2_OPT, [tc, result])
+    except JuliaJobError as e:
+        output = f"{e.output}\n{e}"
+        raise
+    finally:
+        # written for failed cases too, like the old `> log 2>&1`
+        with open(log, "w") as lf:
+            lf.write(output)
+    return time.perf_counter() - start
 
-s = time.perf_counter()
-
-time_list = {}
-possible_case = generate_permutation(params=params)
-
-for index, case in enumerate(tqdm(possible_case)):
-    
-    cei = case["passengers_cei"]
-    t2 = case["passengers_t2"]
-    w_max = case["w_max"]
-    bus = case["buses"]
+def main():
+    s = time.perf_counter()
 
-    start = time.perf_counter()
-    execute_case(case)
-    end = time.perf_counter()
+    time_list = {}
+    failures = []
+    skipped = []
+    done = load_manifest(DONE_FILE)
+    possible_case = generate_permutation(params=params)
 
-    time_list[f"{cei}_{t2}_{w_max}_{bus}"] = end - start
+    # max_workers persistent Julia workers: Julia startup and JuMP/CPLEX compilation are paid once per worker
+    max_workers = min(4, len(possible_case))
+    with JuliaPool(size=max_workers) as julia, \
+         ThreadPoolExecutor(max_workers=max_workers) as ex, \
+         tqdm(total=len(possible_case)) as pbar:
+        future_to_case = {ex.submit(execute_case, case, julia): case for case in possible_case}
+        for fut in as_completed(future_to_case):
+            case = future_to_case[fut]
+            key = f"{case['passengers_cei']}_{case['passengers_t2']}_{case['w_max']}_{case['buses']}"
+            try:
+                t = fut.result()
+                if t is None:
+                    skipped.append(key)
+                else:
+                    time_list[key] = t
+                    done[key] = {"runtime": round(t, 3), "status": result_status(case_paths(case)[1])}
+                    save_manifest(DONE_FILE, done)
+            except Exception as e:
+                failures.append((key, str(e)))
+            finally:
+                pbar.update(1)
 
-    # if (index + 1) % 5 == 0:
-    #     time.sleep(3.5 * 60)
+    print(f"Total time to Execute {time.perf_counter() - s:.3f} sec")
+    if time_list:
+        print(f"Average Case time {sum(time_list.values())/len(time_list.values()):.3f} sec")
+    print("========================================")
 
-print(f"Total time to Execute {time.perf_counter() - s:.3f} sec")
-print(f"Average Case time {sum(time_list.values())/len(time_list.values()):.3f} sec")
-print("========================================")
+    for case, t in time_list.items():
+        print(f"Case {case} use time {t:.3f} sec")
+    for case in skipped:
+        print(f"Case {case} skipped (result up to date)")
+    for case, err in failures:
+        print(f"Case {case} failed: {err}")
 
-for case, t in time_list.items():
-    print(f"Case {case} use time {t:.3f} sec")
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,14 @@
 import os
 import time
-import subprocess
+import asyncio
 from typing import List, Dict
 from itertools import product
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
+from julia_pool import AsyncJuliaPool, JuliaJobError, PROJECT_PATH
+from case_cache import is_newer, result_status, load_manifest, save_manifest
 
-PROJECT_PATH = "/home/hpcnc/bus_opt"
-JULIA_BIN = os.path.expanduser("~/tool/julia/julia")
+BUS2_OPT = os.path.join(PROJECT_PATH, "bus2_opt.jl")
+DONE_FILE = os.path.join(PROJECT_PATH, "done.json")  # case -> {runtime, status} of completed runs
 
 params = {
     "lambda_per_hour_cei": [75, 115, 150],
@@ -33,8 +34,9 @@ def ensure_dirs():
     os.makedirs(os.path.join(PROJECT_PATH, "output"), exist_ok=True)
     os.makedirs(os.path.join(PROJECT_PATH, "log"), exist_ok=True)
 
-def execute_case(p: dict):
-    """Run one case (blocking). Raises on failure."""
+async def execute_case(p: dict, julia: AsyncJuliaPool, done: dict):
+    """Run one case on the next idle worker and record it in `done`; skipped if its result is newer
+    than the case file. Raises on failure."""
     cei = p["lambda_per_hour_cei"]
     t2 = p["lambda_per_hour_t2"]
     w_max = p["w_max"]
@@ -50,43 +52,52 @@ def execute_case(p: dict):
 
     if not os.path.exists(tc_abs):
         raise FileNotFoundError(f"Config not found: {tc_abs}")
-
-    with open(log_abs, "w") as lf:
-        subprocess.run(
-            [JULIA_BIN, os.path.join(PROJECT_PATH, "bus2_opt.jl"), tc_abs, out_abs],
-            stdout=lf,
-            stderr=subprocess.STDOUT,
-            check=True
-        )
+    if is_newer(out_abs, tc_abs):
+        return out_abs
+
+    start = time.perf_counter()
+    output = ""
+    try:
+        output = await julia.execute(BUS2_OPT, [tc_abs, out_abs])
+    except JuliaJobError as e:
+        output = f"{e.output}\n{e}"
+        raise
+    finally:
+        # written for failed cases too (stdout and stderr, as with stderr=STDOUT before)
+        with open(log_abs, "w") as lf:
+            lf.write(output)
+
+    # Single event-loop thread: no lock needed around the manifest update
+    done[f"{cei}_{t2}_{w_max}_{bus}"] = {"runtime": round(time.perf_counter() - start, 3), "status": result_status(out_abs)}
+    save_manifest(DONE_FILE, done)
     return out_abs
 
-def chunked(seq, n):
-    """Yield lists of size n from seq."""
-    for i in range(0, len(seq), n):
-        yield seq[i:i+n]
+async def run_all(all_cases: List[Dict[str, int]], max_workers: int) -> list:
+    """Run every case, max_workers at a time; returns [(case, error)] for the failed ones."""
+    failures = []
+    done = load_manifest(DONE_FILE)
+    # Persistent Julia workers: Julia startup and JuMP/CPLEX compilation are paid once per worker, not per case.
+    # The idle-worker queue bounds concurrency, so there are no threads and no per-batch barriers.
+    async with AsyncJuliaPool(size=max_workers) as julia:
+        with tqdm(total=len(all_cases)) as pbar:
+            async def run(case):
+                try:
+                    await execute_case(case, julia, done)
+                except Exception as e:
+                    failures.append((case, str(e)))
+                finally:
+                    pbar.update(1)
+
+            await asyncio.gather(*(run(case) for case in all_cases))
+    return failures
 
 def main():
     ensure_dirs()
 
     all_cases = generate_permutation(params=params)
-    total = len(all_cases)
 
     max_workers = 4
-    batch_size  = 4
-    failures = []
-
-    with tqdm(total=total) as pbar:
-        for batch in chunked(all_cases, batch_size):
-            with ThreadPoolExecutor(max_workers=max_workers) as ex:
-                future_to_case = {ex.submit(execute_case, case): case for case in batch}
-                for fut in as_completed(future_to_case):
-                    case = future_to_case[fut]
-                    try:
-                        fut.result()
-                    except Exception as e:
-                        failures.append((case, str(e)))
-                    finally:
-                        pbar.update(1)
+    failures = asyncio.run(run_all(all_cases, max_workers))
 
     if failures:
         print("\nSome cases failed:")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# Hot loop of test.py's bus-flow check, kept free of Python objects so Numba can compile it.
+# test.py JIT-compiles it (cached on disk); `python test/checker_kernels.py` instead builds it ahead of time
+# into _checker_aot next to this file, which test.py imports first, so a fresh checker run does no compiling.
+import os
+import numpy as np
+
+def flow_kernel(rank, ts, terms, init_term, other, tau):
+    # Walk every bus's departures (sorted by bus, t, terminal; terminal 0 = CEI, 1 = T2; other[term] = opposite side).
+    # Returns rows (kind, departure index, extra): kind 0 = M3, 1 = FLOW (extra = free time), 2 = F7/F8 (extra = current terminal)
+    n = len(ts)
+    out = np.empty((3 * n, 3), dtype=np.int64)
+    m = 0
+    cur_term, cur_free_time, last_t = -1, 0, -10**9
+    for k in range(n):
+        if k == 0 or rank[k] != rank[k - 1]:
+            # หา initial terminal (ถ้าไม่ระบุ initial position อนุโลมจากการออกเที่ยวแรก)
+            cur_term = init_term[rank[k]]
+            if cur_term < 0:
+                cur_term = terms[k]
+            cur_free_time = 0  # earliest time the bus can depart (not traveling)
+            last_t = -10**9
+        t = ts[k]
+        # ห้ามออกสองฝั่งเวลาเดียวกัน (จะชนด้วยการเรียงลำดับ)
+        if t == last_t:
+            out[m, 0], out[m, 1], out[m, 2] = 0, k, 0
+            m += 1
+        last_t = t
+
+        # ต้องอยู่ฝั่งเดียวกับเที่ยวที่ออก และต้องไม่ติดเดินทางอยู่
+        if t < cur_free_time:
+            out[m, 0], out[m, 1], out[m, 2] = 1, k, cur_free_time
+            m += 1
+        if terms[k] != cur_term:
+            out[m, 0], out[m, 1], out[m, 2] = 2, k, cur_term
+            m += 1
+
+        # หลังออก จะไปอีกฝั่ง และพร้อมอีกทีที่ t+tau
+        cur_free_time = t + tau
+        cur_term = other[terms[k]]
+    return out[:m]
+
+if __name__ == "__main__":
+    from numba.pycc import CC
+    cc = CC("_checker_aot")
+    cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+    cc.export("flow_kernel", "i8[:,:](i8[:], i8[:], i8[:], i8[:], i8[:], i8)")(flow_kernel)
+    cc.compile()
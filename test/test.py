@@ -1,14 +1,38 @@
 #!/usr/bin/env python3
 import json, sys, math
-from collections import defaultdict, Counter
+import numpy as np
+try:
+    import orjson
+except ImportError:  # stream with ijson, or fall back to the stdlib parser
+    orjson = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
+try:
+    from _checker_aot import flow_kernel  # ahead-of-time build: python test/checker_kernels.py
+except ImportError:
+    from checker_kernels import flow_kernel
+    try:
+        from numba import njit
+        flow_kernel = njit(cache=True)(flow_kernel)
+    except ImportError:  # run the kernel as plain Python
+        pass
+
+EVENT_BIAS = 1 << 30  # t is stored offset by this, so negative times stay distinct
+
+def event_keys(code, rank, t):
+    # (terminal code, bus rank, t) packed into one int64 per row
+    return (code << 56) | (rank << 31) | (t + EVENT_BIAS)
 
 def load_payload(path):
-    with open(path, "r", encoding="utf-8") as f:
-        txt = f.read().strip()
-        if txt.startswith("{"):
-            return json.loads(txt)
-        else:
-            return json.loads(txt.splitlines()[0])
+    # orjson parses the raw bytes in one C call; without it ijson streams the top-level keys from the file
+    with open(path, "rb") as f:
+        if orjson is not None:
+            return orjson.loads(f.read())
+        if ijson is None:
+            return json.load(f)
+        return dict(ijson.kvitems(f, "", use_float=True, multiple_values=True))
 
 def build_index(payload):
     meta = payload["meta"]
@@ -30,66 +54,88 @@ def build_index(payload):
         initpos[rec["bus"]] = rec["terminal"]
 
     # Departures
-    deps = defaultdict(set)  # key=(terminal,bus) -> set of t
-    all_dep_times_by_bus = defaultdict(list)  # bus -> [(t, terminal)]
+    term_code = {"CEI": 0, "T2": 1}
+    bus_rank = {}  # bus -> dense index, in order of its first departure
+    dep_rank, dep_t, dep_term = [], [], []
     for rec in payload["departures"]:
         term, bus, t = rec["terminal"], rec["bus"], rec["t"]
-        deps[(term, bus)].add(t)
-        all_dep_times_by_bus[bus].append((t, term))
-    for bus in all_dep_times_by_bus:
-        all_dep_times_by_bus[bus].sort()
-
-    # Assignments
-    asg = defaultdict(list)  # (terminal,bus,t) -> [p,...]
-    per_passenger_count = {"CEI": Counter(), "T2": Counter()}
-    stored_asg = []
-    for rec in payload["assignments"]:
-        term, p, bus, t, wait = rec["terminal"], rec["p"], rec["bus"], rec["t"], rec["wait"]
-        asg[(term,bus,t)].append(p)
-        per_passenger_count[term][p] += 1
-        stored_asg.append((term,p,bus,t,wait))
+        dep_rank.append(bus_rank.setdefault(bus, len(bus_rank)))
+        dep_t.append(t)
+        dep_term.append(term_code.setdefault(term, len(term_code)))
+
+    # Per-bus departure sequence as int arrays sorted by (bus, t, terminal) for flow_kernel
+    dep_rank = np.array(dep_rank, dtype=np.int64)
+    dep_t = np.array(dep_t, dtype=np.int64)
+    dep_term = np.array(dep_term, dtype=np.int64)
+    dep_key = event_keys(dep_term, dep_rank, dep_t)
+    order = np.lexsort((dep_term, dep_t, dep_rank))
+    init_term = np.array([term_code.setdefault(initpos[b], len(term_code)) if b in initpos else -1 for b in bus_rank],
+                         dtype=np.int64)
+    dep_seq = {"rank": dep_rank[order], "t": dep_t[order], "term": dep_term[order], "init_term": init_term}
+
+    # Assignments, one list per field instead of a 5-tuple per row
+    recs = payload["assignments"]
+    asg = {k: [rec[f] for rec in recs] for k, f in (("term", "terminal"), ("p", "p"), ("bus", "bus"), ("t", "t"), ("wait", "wait"))}
+    # Passengers interned per terminal as their position in arrivals (-1 = no arrival), counted with one bincount each
+    pid_index = {term: {p: i for i, p in enumerate(arr)} for term, arr in arrivals.items()}
+    asg_pid = np.array([pid_index[term].get(p, -1) for term, p in zip(asg["term"], asg["p"])], dtype=np.int64)
+    # (terminal code, bus rank, t) of every assignment, one int row each, instead of a list of p per event
+    asg_event = np.array([(term_code[term], bus_rank.setdefault(bus, len(bus_rank)), t) for term, bus, t in zip(asg["term"], asg["bus"], asg["t"])],
+                         dtype=np.int64).reshape(-1, 3)
 
     return {
         "tau": tau, "cap": cap, "wmax": wmax, "T_end": T_end,
         "arrivals": arrivals, "initpos": initpos,
-        "deps": deps, "dep_seq": all_dep_times_by_bus,
-        "asg": asg, "asg_list": stored_asg,
+        "dep_key": dep_key, "dep_seq": dep_seq, "buses": list(bus_rank), "term_names": list(term_code),
+        "asg_event": asg_event, "asg_key": event_keys(*asg_event.T), "asg": asg, "wait_sum": sum(asg["wait"]),
+        "asg_count": {term: np.bincount(asg_pid[(asg_event[:, 0] == code) & (asg_pid >= 0)], minlength=len(arrivals[term]))
+                      for code, term in enumerate(("CEI", "T2"))},
         "objective": payload.get("objective"),
         "status": payload.get("status")
     }
 
 def check_unique_assignment(idx, errors):
     # F1/F4: ผู้โดยสารแต่ละคนต้องถูก assign = 1 เที่ยว
+    # (per-passenger counts come from build_index, indexed like arrivals[term]; only bad ones are formatted)
     for term in ("CEI","T2"):
-        arr = idx["arrivals"][term]
-        cnt = idx["asg"]
-        seen = Counter()
-        for (tm,bus,t), plist in idx["asg"].items():
-            if tm != term: continue
-            for p in plist: seen[p] += 1
-        for p in arr.keys():
-            if seen[p] != 1:
-                errors.append(f"[F1/F4] Passenger {term}:{p} assigned {seen[p]} times (expected 1)")
+        pids = list(idx["arrivals"][term])
+        seen = idx["asg_count"][term]
+        for k in np.flatnonzero(seen != 1).tolist():
+            errors.append(f"[F1/F4] Passenger {term}:{pids[k]} assigned {seen[k]} times (expected 1)")
 
 def check_assignment_link_to_departure(idx, errors):
     # x ≤ bd: ทุก assignment ต้องมี departure ตรงกัน
-    for (term,p,bus,t,wait) in idx["asg_list"]:
-        if t not in idx["deps"][(term,bus)]:
-            errors.append(f"[Link x→bd] Assignment without matching departure: {term} bus{bus} t={t} p={p}")
+    # one vectorized membership test of packed (terminal, bus, t) keys instead of a tuple-keyed lookup per assignment
+    for k in np.flatnonzero(~np.isin(idx["asg_key"], idx["dep_key"])).tolist():
+        term, p, bus, t = (idx["asg"][f][k] for f in ("term", "p", "bus", "t"))
+        errors.append(f"[Link x→bd] Assignment without matching departure: {term} bus{bus} t={t} p={p}")
 
 def check_capacity(idx, errors):
     # F3/F6: จำนวนผู้โดยสารต่อเที่ยว ≤ capacity
     cap = idx["cap"]
-    for key, plist in idx["asg"].items():
-        if len(plist) > cap:
-            term,bus,t = key
-            errors.append(f"[F3/F6] Capacity exceeded at {term} bus{bus} t={t}: {len(plist)} > {cap}")
+    events, first, counts = np.unique(idx["asg_event"], axis=0, return_index=True, return_counts=True)
+    over = np.flatnonzero(counts > cap)
+    for k in over[np.argsort(first[over])].tolist():  # in order of first appearance, as before
+        code, rank, t = events[k].tolist()
+        errors.append(f"[F3/F6] Capacity exceeded at {idx['term_names'][code]} bus{idx['buses'][rank]} t={t}: {counts[k]} > {cap}")
 
 def check_wait_and_windows(idx, errors):
     # T3/T4 + last-window + wait = t - arr
     tau, wmax, Tend = idx["tau"], idx["wmax"], idx["T_end"]
-    for (term,p,bus,t,wait) in idx["asg_list"]:
-        arr = idx["arrivals"][term].get(p, None)
+    asg = idx["asg"]
+    arrivals = idx["arrivals"]  # terminal -> {p: arr}, hoisted out of the per-assignment loops
+    if not asg["t"]:
+        return
+    # All assignments at once as float arrays (missing arrival -> nan); only flagged rows are formatted below
+    arr = np.array([arrivals[term].get(p, np.nan) for term, p in zip(asg["term"], asg["p"])], dtype=np.float64)
+    t = np.array(asg["t"], dtype=np.float64)
+    wait = np.array(asg["wait"], dtype=np.float64)
+    missing = np.isnan(arr)
+    flagged = missing | (wait != t - arr) | (wait < 0) | (wait > wmax) | (t > Tend - tau)
+
+    for k in np.flatnonzero(flagged).tolist():
+        term, p, t, wait = asg["term"][k], asg["p"][k], asg["t"][k], asg["wait"][k]
+        arr = arrivals[term].get(p)
         if arr is None:
             errors.append(f"[ARR] Missing arrival for {term}:{p}")
             continue
@@ -104,44 +150,24 @@ def check_wait_and_windows(idx, errors):
 
 def check_bus_flow(idx, errors):
     # F7–F12, M3: รถคันเดียวออกได้ทีละฝั่ง, ต้องคั่นด้วย tau, ห้ามออกระหว่างกำลังเดินทาง
-    tau = idx["tau"]
-    initpos = idx["initpos"]
-    dep_seq = idx["dep_seq"]
-
-    for bus, seq in dep_seq.items():
-        seq_sorted = sorted(seq)  # [(t,term)]
-        # หา initial terminal
-        cur_term = initpos.get(bus, None)
-        cur_free_time = 0  # earliest time the bus can depart (not traveling)
-
-        if cur_term is None and seq_sorted:
-            # ถ้าไม่ระบุ initial position แต่มีตาราง อนุโลมจากการออกเที่ยวแรก
-            cur_term = seq_sorted[0][1]
-
-        last_t = -10**9
-        for (t, term) in seq_sorted:
-            # ห้ามออกสองฝั่งเวลาเดียวกัน (จะชนด้วยการเรียงลำดับ)
-            if t == last_t:
-                errors.append(f"[M3] Bus{bus} multiple departures at same t={t} (check both terminals)")
-            last_t = t
-
-            # ต้องอยู่ฝั่งเดียวกับเที่ยวที่ออก และต้องไม่ติดเดินทางอยู่
-            if t < cur_free_time:
-                errors.append(f"[FLOW] Bus{bus} departs at t={t} while still traveling until {cur_free_time}")
-            if term != cur_term:
-                errors.append(f"[F7/F8] Bus{bus} departs from {term} at t={t} but current terminal is {cur_term}")
-
-            # หลังออก จะไปอีกฝั่ง และพร้อมอีกทีที่ t+tau
-            cur_free_time = t + tau
-            cur_term = "T2" if term == "CEI" else "CEI"
+    seq = idx["dep_seq"]
+    names, buses = idx["term_names"], idx["buses"]
+    other = np.zeros(len(names), dtype=np.int64)  # CEI -> T2, anything else -> CEI
+    other[0] = 1
+    for kind, k, extra in flow_kernel(seq["rank"], seq["t"], seq["term"], seq["init_term"], other, int(idx["tau"])).tolist():
+        bus, t = buses[seq["rank"][k]], int(seq["t"][k])
+        if kind == 0:
+            errors.append(f"[M3] Bus{bus} multiple departures at same t={t} (check both terminals)")
+        elif kind == 1:
+            errors.append(f"[FLOW] Bus{bus} departs at t={t} while still traveling until {extra}")
+        else:
+            errors.append(f"[F7/F8] Bus{bus} departs from {names[seq['term'][k]]} at t={t} but current terminal is {names[extra]}")
 
 def check_objective(idx, errors):
     # ตรวจ sum(wait) = objective (เผื่อ tolerance)
     if idx["objective"] is None:
         return
-    s = 0
-    for (_,_,_,_,w) in idx["asg_list"]:
-        s += w
+    s = idx["wait_sum"]  # summed once in build_index
     if not math.isfinite(idx["objective"]) or abs(idx["objective"] - s) > 1e-6:
         errors.append(f"[OBJ] objective reported {idx['objective']} but recomputed {s}")
 
@@ -1,25 +1,68 @@
 #!/usr/bin/env python3
-import json, sys, math, argparse
+import os, json, sys, math, argparse, functools
 from collections import defaultdict, Counter
+import numpy as np
+try:
+    import orjson
+except ImportError:  # stream with ijson, or fall back to the stdlib parser
+    orjson = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 def load_json(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    # orjson parses the raw bytes in one C call; without it ijson streams the top-level keys from the file
+    with open(path, "rb") as f:
+        if orjson is not None:
+            return orjson.loads(f.read())
+        if ijson is None:
+            return json.load(f)
+        return dict(ijson.kvitems(f, "", use_float=True))
 
 def norm_pid(x):
     return str(x)
 
+TERMS = ("CEI", "T2")
+OTHER = {"CEI": "T2", "T2": "CEI"}
+TERM_CODE = {term: k for k, term in enumerate(TERMS)}
+
+EVENT_BIAS = 1 << 30  # bus and t are stored offset by this, so negative values keep their order
+
+def event_key(term, bus, t):
+    # (terminal, bus, t) packed into one int below 2**63; sorts like the tuple
+    return (TERM_CODE[term] << 62) | ((bus + EVENT_BIAS) << 31) | (t + EVENT_BIAS)
+
+def unpack_event(key):
+    return TERMS[key >> 62], ((key >> 31) & 0x7FFFFFFF) - EVENT_BIAS, (key & 0x7FFFFFFF) - EVENT_BIAS
+
+def records(recs, with_p=False):
+    # Departures / assignments as parallel arrays (terminal[, p], bus, t) instead of one dict per record
+    recs = list(recs)
+    soa = {"terminal": np.array([r["terminal"] for r in recs], dtype=str)}
+    if with_p:
+        soa["p"] = np.array([norm_pid(r["p"]) for r in recs], dtype=str)
+    soa["bus"] = np.array([int(r["bus"]) for r in recs], dtype=np.int64)
+    soa["t"] = np.array([int(r["t"]) for r in recs], dtype=np.int64)
+    return soa
+
+def sort_records(soa):
+    # stable sort by (t, bus, terminal): ties keep their input order
+    order = np.lexsort((soa["terminal"], soa["bus"], soa["t"]))
+    return {k: v[order] for k, v in soa.items()}
+
+def events(asg):
+    by_event = defaultdict(list)
+    for term, p, bus, t in zip(*(asg[k].tolist() for k in ("terminal", "p", "bus", "t"))):
+        by_event[event_key(term, bus, t)].append(p)
+    for plist in by_event.values():
+        plist.sort()  # sorted once here, build_label_mapping pairs them up as is
+    return by_event
+
 def index_payload(payload):
-    deps = []
-    for d in payload.get("departures", []):
-        deps.append({"terminal":d["terminal"], "bus":int(d["bus"]), "t":int(d["t"])})
-    deps.sort(key=lambda e: (e["t"], e["bus"], e["terminal"]))
-    asg = []
-    asg_by_event = defaultdict(list)
-    for a in payload.get("assignments", []):
-        rec = {"terminal":a["terminal"], "p":norm_pid(a["p"]), "bus":int(a["bus"]), "t":int(a["t"])}
-        asg.append(rec)
-        asg_by_event[(rec["terminal"], rec["bus"], rec["t"])].append(rec["p"])
+    deps = sort_records(records(payload.get("departures", [])))
+    asg = records(payload.get("assignments", []), with_p=True)
+    asg_by_event = events(asg)
     arr = {"CEI":{}, "T2":{}}
     for r in payload.get("arrivals",{}).get("CEI",[]): arr["CEI"][norm_pid(r["p"])] = int(r["arr"])
     for r in payload.get("arrivals",{}).get("T2" ,[]): arr["T2" ][norm_pid(r["p"])] = int(r["arr"])
@@ -36,16 +79,9 @@ def index_payload(payload):
     }
 
 def index_expected(exp):
-    deps = []
-    for d in exp.get("expected_departures", []):
-        deps.append({"terminal":d["terminal"], "bus":int(d["bus"]), "t":int(d["t"])})
-    deps.sort(key=lambda e: (e["t"], e["bus"], e["terminal"]))
-    asg = []
-    asg_by_event = defaultdict(list)
-    for a in exp.get("expected_assignments", []):
-        rec = {"terminal":a["terminal"], "p":norm_pid(a["p"]), "bus":int(a["bus"]), "t":int(a["t"])}
-        asg.append(rec)
-        asg_by_event[(rec["terminal"], rec["bus"], rec["t"])].append(rec["p"])
+    deps = sort_records(records(exp.get("expected_departures", [])))
+    asg = records(exp.get("expected_assignments", []), with_p=True)
+    asg_by_event = events(asg)
     arr = {"CEI":{}, "T2":{}}
     for k,v in exp.get("arrivals",{}).get("CEI",{}).items(): arr["CEI"][norm_pid(k)] = int(v)
     for k,v in exp.get("arrivals",{}).get("T2" ,{}).items(): arr["T2" ][norm_pid(k)] = int(v)
@@ -53,18 +89,28 @@ def index_expected(exp):
     init = exp.get("init", exp.get("initial_positions", []))
     infeasible = bool(exp.get("infeasible", False))
     obj = exp.get("expected_objective", None)
-    return {"deps":deps, "asg":asg, "asg_by_event":asg_by_event, "arrivals":arr, "meta":meta, "init":init, "infeasible":infeasible, "expected_objective":obj}
+    # recomputed objective of the expected schedule, once per cached case (None: not needed, or an arrival is missing)
+    obj_chk = None
+    if obj is not None:
+        try:
+            obj_chk = squared_objective(asg, arr)
+        except KeyError:
+            pass
+    return {"deps":deps, "asg":asg, "asg_sorted":sort_records(asg), "asg_by_event":asg_by_event, "arrivals":arr, "meta":meta, "init":init, "infeasible":infeasible, "expected_objective":obj, "objective_check":obj_chk}
 
 def build_label_mapping(exp_idx, got_idx):
     mapping = {}   # label -> pid
     inverse = {}   # pid -> label
     errors = []
-    keys = set(exp_idx["asg_by_event"].keys()) | set(got_idx["asg_by_event"].keys())
-    for key in sorted(keys):
-        e_list = sorted(exp_idx["asg_by_event"].get(key, []))
-        g_list = sorted(got_idx["asg_by_event"].get(key, []))
+    # no sort over the events: dict insertion order (first appearance in the file) is already deterministic
+    exp_ev, got_ev = exp_idx["asg_by_event"], got_idx["asg_by_event"]
+    for key, g_list in got_ev.items():
+        if key not in exp_ev:
+            errors.append(f"[ASSIGN-COUNT] event {unpack_event(key)} expected 0 got {len(g_list)}")
+    for key, e_list in exp_ev.items():
+        g_list = got_ev.get(key, [])
         if len(e_list) != len(g_list):
-            errors.append(f"[ASSIGN-COUNT] event {key} expected {len(e_list)} got {len(g_list)}")
+            errors.append(f"[ASSIGN-COUNT] event {unpack_event(key)} expected {len(e_list)} got {len(g_list)}")
             continue
         for lab, pid in zip(e_list, g_list):
             if lab in mapping and mapping[lab] != pid:
@@ -75,16 +121,28 @@ def build_label_mapping(exp_idx, got_idx):
             inverse[pid] = lab
     return mapping, inverse, errors
 
+def as_dicts(soa, rows):
+    cols = [(k, v[rows].tolist()) for k, v in soa.items()]
+    return [dict(zip((k for k, _ in cols), row)) for row in zip(*(v for _, v in cols))]
+
 def assert_equal_sets(got, exp, what, errors):
-    g = sorted(got, key=lambda e: (e["t"], e["bus"], e["terminal"]))
-    e = sorted(exp, key=lambda e: (e["t"], e["bus"], e["terminal"]))
-    if g != e:
-        errors.append(f"[{what}] mismatch\nexpected={e}\n   got={g}")
+    # got / exp already sorted by (t, bus, terminal); compare column-wise and print only the rows that differ
+    n_got, n_exp = len(got["t"]), len(exp["t"])
+    n = min(n_got, n_exp)
+    diff = np.zeros(n, dtype=bool)
+    for k in exp:
+        diff |= got[k][:n] != exp[k][:n]
+    if n_got == n_exp and not diff.any():
+        return
+    rows = np.flatnonzero(diff)
+    e_rows = as_dicts(exp, np.concatenate((rows, np.arange(n, n_exp))))
+    g_rows = as_dicts(got, np.concatenate((rows, np.arange(n, n_got))))
+    errors.append(f"[{what}] mismatch ({len(rows) + abs(n_got - n_exp)} row(s) differ, expected {n_exp}, got {n_got})"
+                  f"\nexpected={e_rows}\n   got={g_rows}")
 
 def squared_objective(assignments, arrivals):
     s = 0
-    for a in assignments:
-        term, p, t = a["terminal"], a["p"], a["t"]
+    for term, p, t in zip(*(assignments[k].tolist() for k in ("terminal", "p", "t"))):
         s += (t - arrivals[term][p])**2
     return s
 
@@ -93,8 +151,7 @@ def check_flow(exp_meta, exp_init, deps, errors):
     init = {int(d["bus"]): d["terminal"] for d in exp_init} if exp_init else {}
     busy_until = {b: -10**9 for b in init}
     cur_term = dict(init)
-    for d in deps:
-        b, term, t = int(d["bus"]), d["terminal"], int(d["t"])
+    for b, term, t in zip(deps["bus"].tolist(), deps["terminal"].tolist(), deps["t"].tolist()):
         if b not in cur_term:
             cur_term[b] = term
             busy_until[b] = -10**9
@@ -103,13 +160,21 @@ def check_flow(exp_meta, exp_init, deps, errors):
         if term != cur_term[b]:
             errors.append(f"[LOC] bus{b} departs {term} but at {cur_term[b]}")
         busy_until[b] = t + tau
-        cur_term[b] = "T2" if term == "CEI" else "CEI"
+        cur_term[b] = OTHER.get(term, "CEI")
+
+@functools.lru_cache(maxsize=32)
+def _indexed_expected(path, mtime_ns, size):
+    return index_expected(load_json(path))
+
+def load_expected(path):
+    # Parsed and indexed once per file version when many results are checked against the same case (read-only)
+    st = os.stat(path)
+    return _indexed_expected(path, st.st_mtime_ns, st.st_size)
 
 def check_case(expected_path, result_path):
-    exp = load_json(expected_path)
+    exp_idx = load_expected(expected_path)
     got = load_json(result_path)
 
-    exp_idx = index_expected(exp)
     got_idx = index_payload(got)
     errors = []
 
@@ -129,20 +194,17 @@ def check_case(expected_path, result_path):
     mapping, inverse, map_errs = build_label_mapping(exp_idx, got_idx)
     errors.extend(map_errs)
 
-    got_asg_labeled = []
-    for a in got_idx["asg"]:
-        pid = a["p"]
-        label = inverse.get(pid, pid)
-        got_asg_labeled.append({"terminal":a["terminal"], "p":label, "bus":a["bus"], "t":a["t"]})
-    assert_equal_sets(got_asg_labeled, exp_idx["asg"], "ASSIGNMENTS", errors)
+    got_asg_labeled = dict(got_idx["asg"])
+    got_asg_labeled["p"] = np.array([inverse.get(pid, pid) for pid in got_idx["asg"]["p"].tolist()], dtype=str)
+    assert_equal_sets(sort_records(got_asg_labeled), exp_idx["asg_sorted"], "ASSIGNMENTS", errors)
 
     cap = int(exp_idx["meta"]["capacity"])
     seen = {"CEI":Counter(), "T2":Counter()}
     for key, plist in got_idx["asg_by_event"].items():
         if len(plist) > cap:
-            term, bus, t = key
+            term, bus, t = unpack_event(key)
             errors.append(f"[CAP] {term} bus{bus} t={t}: {len(plist)}>{cap}")
-        term = key[0]
+        term = TERMS[key >> 62]
         for p in plist:
             seen[term][p] += 1
     for term in ("CEI","T2"):
@@ -153,12 +215,13 @@ def check_case(expected_path, result_path):
                 errors.append(f"[F1/F4] {term}:{lab} assigned {cnt} times")
 
     T_end = int(exp_idx["meta"]["T_end"]); tau = int(exp_idx["meta"]["tau"]); wmax = int(exp_idx["meta"]["w_max"])
-    for a in got_idx["asg"]:
-        term, pid, t = a["terminal"], a["p"], int(a["t"])
-        if pid not in got_idx["arrivals"][term]:
+    got_arr = got_idx["arrivals"]
+    for term, pid, t in zip(*(got_idx["asg"][k].tolist() for k in ("terminal", "p", "t"))):
+        arr = got_arr[term].get(pid)
+        if arr is None:
             errors.append(f"[ARR] missing arrival for {term} pid={pid}")
             continue
-        arr = int(got_idx["arrivals"][term][pid])
+        arr = int(arr)
         wait = t - arr
         if wait < 0:
             errors.append(f"[ARR] negative wait {term} pid={pid} arr={arr} t={t}")
@@ -176,7 +239,9 @@ def check_case(expected_path, result_path):
             errors.append(f"[OBJ] objective {got_obj} != expected {exp_obj}")
         # Optional internal check using expected arrivals/labels:
         if exp_idx["arrivals"]["CEI"] or exp_idx["arrivals"]["T2"]:
-            obj_chk = squared_objective(exp_idx["asg"], exp_idx["arrivals"])
+            obj_chk = exp_idx["objective_check"]
+            if obj_chk is None:  # missing arrival: raise from the recomputation, as before
+                obj_chk = squared_objective(exp_idx["asg"], exp_idx["arrivals"])
             if abs(obj_chk - exp_obj) > 1e-9:
                 errors.append(f"[OBJ-CHECK] expected {exp_obj} but recomputed {obj_chk}")
 
@@ -185,18 +250,21 @@ def check_case(expected_path, result_path):
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--case", required=True, help="Expected-case JSON path")
-    ap.add_argument("result", help="Solver output JSON (result.json)")
+    ap.add_argument("result", nargs="+", help="Solver output JSON(s) (result.json)")
     args = ap.parse_args()
 
-    errs = check_case(args.case, args.result)
-    if errs:
-        print("✗ TEST FAILED")
-        for e in errs:
-            print(" -", e)
-        # sys.exit(1)
-    else:
-        print("✓ TEST PASSED")
-        # sys.exit(0)
+    for result in args.result:
+        if len(args.result) > 1:
+            print(f"== {result}")
+        errs = check_case(args.case, result)
+        if errs:
+            print("✗ TEST FAILED")
+            for e in errs:
+                print(" -", e)
+            # sys.exit(1)
+        else:
+            print("✓ TEST PASSED")
+            # sys.exit(0)
 
 if __name__ == "__main__":
     main()